@@ -1,470 +1,917 @@
-import streamlit as st
-import time  # Import the time module to use sleep
-
-# This must be the first Streamlit command
-st.set_page_config(page_title="SmartExam Creator", page_icon="📝")
-
-from st_supabase_connection import SupabaseConnection
-from stqdm import stqdm
-from supabase import Client 
-from openai import OpenAI
-import dotenv
-import os
-import json
-from PyPDF2 import PdfReader
-from PIL import Image
-from io import BytesIO
-from fpdf import FPDF
-import base64
-import PyPDF2
-from streamlit_supabase_auth import login_form, logout_button
-from supabase import create_client, Client
-from st_pages import show_pages_from_config
-
-__version__ = "1.1.0"
-
-show_pages_from_config()
-
-hide_streamlit_style = """
-<style>
-div[data-testid="stToolbar"] {
-visibility: hidden;
-height: 0%;
-position: fixed;
-}
-div[data-testid="stDecoration"] {
-visibility: hidden;
-height: 0%;
-position: fixed;
-}
-div[data-testid="stStatusWidget"] {
-visibility: hidden;
-height: 0%;
-position: fixed;
-}
-#MainMenu {
-visibility: hidden;
-height: 0%;
-}
-header {
-visibility: hidden;
-height: 0%;
-}
-footer {
-visibility: hidden;
-height: 0%;
-}
-</style>
-"""
-st.markdown(hide_streamlit_style, unsafe_allow_html=True)
-
-# Load environment variables
-dotenv.load_dotenv()
-
-hide_default_format = """
-       <style>
-       #MainMenu {visibility: hidden; }
-       footer {visibility: hidden;}
-       </style>
-       """
-st.markdown(hide_default_format, unsafe_allow_html=True)
-
-#Show info banner
-
-#Apis
-
-SUPABASE_URL = st.secrets["SUPABASE_URL"]
-SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# Resetting quiz state
-
-def reset_quiz_state():
-    """Resets the session state for a new quiz, ensuring fresh state for each new upload."""
-    st.session_state.answers = []
-    st.session_state.feedback = []
-    st.session_state.correct_answers = 0
-    st.session_state.mc_test_generated = False
-    st.session_state.generated_questions = []
-    st.session_state.content_text = None
-    st.session_state.current_question_index = 0
-    st.session_state.quiz_data = None
-    st.session_state.quiz_active = False
-    st.session_state.last_upload_content = ""
-
-def initialize_app():
-    if "app_mode" not in st.session_state:
-        st.session_state.app_mode = "Upload PDF & Generate Questions"
-    if "quiz_active" not in st.session_state:
-        st.session_state.quiz_active = False
-
-def sidebar_reset_button():
-    if st.sidebar.button("New Exam"):
-        reset_quiz_state()
-        st.session_state.app_mode = "Upload PDF & Generate Questions"
-        st.session_state.quiz_active = False
-        st.rerun()
-
-# Main app functions
-def stream_llm_response(messages, model_params, api_key):
-    client = OpenAI(api_key=api_key)
-    retries = 5  # Maximum number of retries
-    jitter = 0.5  # Fixed jitter value to prevent synchronized retries
-    for attempt in range(retries):
-        try:
-            # Attempt the request
-            response = client.chat.completions.create(
-                model=model_params.get("model", "gpt-4o"),       #Test change to 4o
-                messages=messages,
-                temperature=model_params.get("temperature", 0.3),
-                max_tokens=model_params.get("max_tokens", 4096),
-            )
-            return response.choices[0].message.content  # Return on success
-        except RateLimitError:
-            # Handle rate limiting errors with backoff
-            if attempt < retries - 1:  # Don't retry after the last attempt
-                wait_time = (2 ** attempt) + jitter  # Exponential backoff with fixed jitter
-                st.warning(f"Rate limit hit. Retrying in {wait_time:.2f} seconds...")
-                time.sleep(wait_time)
-            else:
-                st.error("Rate limit exceeded. Please try again later.")
-                st.stop()  # Gracefully stop execution
-        except OpenAIError as e:
-            # Handle other OpenAI errors
-            st.error(f"OpenAI API error: {e}")
-            st.stop()
-
-
-def extract_text_from_pdf(pdf_file):
-    pdf_reader = PdfReader(pdf_file)
-    text = ""
-    for page in pdf_reader.pages:
-        text += page.extract_text() + "\n"
-    return text
-
-# Function to fetch the subscription tier from Supabase
-def fetch_subscription_tier(user_id):
-    response = supabase.table("user_data").select("subscription_tier", "mc_upload_count").eq("id", user_id).execute()
-    if response.data and len(response.data) > 0:
-        return response.data[0]["subscription_tier"], response.data[0]["mc_upload_count"]
-    else:
-        return None, None
-
-# Function to increment pdf_upload_count in the database
-def increment_mc_upload_count(user_id):
-    response = supabase.rpc("increment_mc_upload_count", {"user_uuid": user_id}).execute()
-    st.write(f"MC Upload Count Increment Response: {response}")  # Debugging response
-
-def summarize_text(text, api_key=st.secrets["OPENAI_API_KEY"]):
-    prompt = (
-        "Please summarize the following text to be concise and to the point:\n\n" + text
-    )
-    messages = [
-        {"role": "user", "content": prompt},
-    ]
-    summary = stream_llm_response(messages, model_params={"model": "gpt-4o", "temperature": 0.3}, api_key=api_key)              #Test change to 4o
-    return summary
-
-def chunk_text(text, max_tokens=2000):
-    sentences = text.split('. ')
-    chunks = []
-    chunk = ""
-    for sentence in sentences:
-        if len(chunk) + len(sentence) > max_tokens:
-            chunks.append(chunk)
-            chunk = sentence + ". "
-        else:
-            chunk += sentence + ". "
-    if chunk:
-        chunks.append(chunk)
-    return chunks
-
-def generate_mc_questions(content_text, api_key=st.secrets["OPENAI_API_KEY"]):
-    # Explicitly ask for JSON output
-    prompt = (
-        f"You are a university professor. Using the provided lecture content, create a Master-level multiple-choice exam in strict JSON format that includes 25 questions. "
-        f"Ensure the structure is:\n\n"
-        f"[{{'question': '...', 'choices': ['...'], 'correct_answer': '...', 'explanation': '...'}}, ...]\n\n"
-        f"Content:\n\n{content_text}"
-    )
-    messages = [{"role": "user", "content": prompt}]
-    response = stream_llm_response(messages, model_params={"model": "gpt-4o", "temperature": 0.3}, api_key=api_key)              #Test change to 4o
-    return response
-
-# Function to parse questions, with fallback to plain text display if parsing fails
-def parse_generated_questions(response):
-    try:
-        # Attempt to parse JSON if it's in expected format
-        json_start = response.find('[')
-        json_end = response.rfind(']') + 1
-        json_str = response[json_start:json_end]
-        questions = json.loads(json_str)
-        return questions
-    except json.JSONDecodeError:
-        # If parsing fails, display raw response as text output
-        st.warning("Unable to parse as JSON. Displaying response as text.")
-        st.text(response)
-        return None
-
-def get_question(index, questions):
-    return questions[index]
-
-def initialize_session_state(questions):
-    session_state = st.session_state
-    session_state.current_question_index = 0
-    session_state.quiz_data = get_question(session_state.current_question_index, questions)
-    session_state.correct_answers = 0
-
-class PDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 12)
-        self.cell(0, 10, 'Generated Exam', 0, 1, 'C')
-
-    def chapter_title(self, title):
-        self.set_font('Arial', 'B', 12)
-        self.multi_cell(0, 10, title)
-        self.ln(5)
-
-    def chapter_body(self, body):
-        self.set_font('Arial', '', 12)
-        self.multi_cell(0, 10, body)
-        self.ln()
-
-def generate_pdf(questions):
-    pdf = PDF()
-    pdf.add_page()
-
-    for i, q in enumerate(questions):
-        question = f"Q{i+1}: {q['question']}"
-        question = question.replace("—", "-").encode('latin1', 'replace').decode('latin1')
-        pdf.chapter_title(question)
-
-        choices = "\n".join(q['choices'])
-        choices = choices.replace("—", "-").encode('latin1', 'replace').decode('latin1')
-        pdf.chapter_body(choices)
-
-        correct_answer = f"Correct answer: {q['correct_answer']}"
-        correct_answer = correct_answer.replace("—", "-").encode('latin1', 'replace').decode('latin1')
-        pdf.chapter_body(correct_answer)
-
-        explanation = f"Explanation: {q['explanation']}"
-        explanation = explanation.replace("—", "-").encode('latin1', 'replace').decode('latin1')
-        pdf.chapter_body(explanation)
-
-    return pdf.output(dest="S").encode("latin1")
-
-# Integration with the main app
-def main():
-    initialize_app()  # Initialize app mode and quiz state tracking
-    sidebar_reset_button()  # Add "Neu Starten" button to sidebar for resetting state
-
-    session = login_form(
-        url=SUPABASE_URL,
-        apiKey=SUPABASE_KEY,
-        providers=["google"],
-    )
-    
-     # If the user is not logged in, stop the app
-    if not session:
-           st.stop()
-           
-
-
-    # Sidebar with logout button and user welcome message
-    with st.sidebar:
-        st.write(f"Welcome {session['user']['email']}")
-        logout_button()
-
-# Fetch and display the user's subscription tier and PDF upload count
-    user_id = session['user']['id']  # Get the user ID from the session
-    subscription_tier, mc_upload_count = fetch_subscription_tier(user_id)
-
-    
-    st.sidebar.write(f"Exams created: **{mc_upload_count}**")
-
-# --- Check if the user has reached the usage limit ---
-# Only enforce usage limit if the subscription tier is "FREE"
-    if subscription_tier == "FREE":
-    # Check if the mc_upload_count is greater than or equal to 3
-        if mc_upload_count >= 100000:
-            st.error("You have reached your free usage limit. We want to give you a limited offer: only 19.99$ One-Time Payment for Lifetime Access to all functions.")
-
-        # Display the "Upgrade Now" button only when the limit is exceeded
-            if st.button("Upgrade Now"):
-            # Meta-refresh-based redirect
-                redirect_url = "https://smartexam.streamlit.app/Pricing"
-                st.markdown(f"""
-                    <meta http-equiv="refresh" content="0; url={redirect_url}">
-                """, unsafe_allow_html=True)
-
-            st.stop()  # Stop further interaction if the limit is reached
-        else:
-            st.info("Welcome, the app is now completely FREE for everyone !")  # Allow access to free users with less than 3 uploads
-
-    elif subscription_tier in ["PREMIUM", "PRO"]:
-        st.success("Welcome, PREMIUM/PRO user! You have unlimited access to all features.")  # Handle PREMIUM/PRO users
-
-# Main app content
-    dotenv.load_dotenv()
-
-    st.sidebar.title("SmartExam Creator")
-
-    app_mode_options = ["Upload PDF & Generate Questions", "Take the Quiz", "Download as PDF"]
-    st.session_state.app_mode = st.sidebar.selectbox(
-        "Choose the app mode", 
-        app_mode_options, 
-        index=app_mode_options.index(st.session_state.app_mode), 
-        key="app_mode_select"
-    )
-
-    if st.session_state.app_mode == "Upload PDF & Generate Questions":
-        pdf_upload_app(user_id)
-    elif st.session_state.app_mode == "Take the Quiz" and st.session_state.quiz_active:
-        mc_quiz_app()
-    elif st.session_state.app_mode == "Download as PDF":
-        download_pdf_app()
-
-
-
-
-def pdf_upload_app(user_id):
-    st.title("Upload Your Lecture - Create Your Test Exam")
-    st.subheader("Show Us the Slides and We do the Rest")
-
-    content_text = ""
-
-    if 'messages' not in st.session_state:
-        st.session_state.messages = []
-    
-    uploaded_pdf = st.file_uploader("Upload a PDF document of up to 100 pages", type=["pdf"])
-    if uploaded_pdf:
-        reset_quiz_state()  # Resets quiz state when a new PDF is uploaded
-        pdf_text = extract_text_from_pdf(uploaded_pdf)
-        content_text += pdf_text
-        st.session_state.last_upload_content = content_text  # Track the latest upload
-        st.success("PDF content added to the session.")
-    
-    if len(content_text) > 3000:
-        content_text = summarize_text(content_text)
-
-    if content_text:
-        st.info("Generating the exam from the uploaded content. It will take just a minute...")
-        chunks = chunk_text(content_text)
-        questions = []
-        for chunk in chunks:
-            response = generate_mc_questions(chunk)
-            parsed_questions = parse_generated_questions(response)
-            if parsed_questions:
-                questions.extend(parsed_questions)
-        if questions:
-            st.session_state.generated_questions = questions
-            st.session_state.answers = [None] * len(questions)
-            st.session_state.feedback = [None] * len(questions)
-            st.session_state.correct_answers = 0
-            st.session_state.mc_test_generated = True
-            st.session_state.quiz_active = True  # Indicate quiz is ready to be taken
-            increment_mc_upload_count(user_id)
-            st.success("The game has been successfully created! Switching to the quiz mode...")
-
-            st.session_state.app_mode = "Take the Quiz"
-            st.rerun()
-        else:
-            st.error("Failed to parse the generated questions. Please check the OpenAI response.")
-    else:
-        st.warning("Please upload a PDF to generate the interactive exam.")
-
-def submit_answer(i, quiz_data):
-    user_choice = st.session_state[f"user_choice_{i}"]
-    st.session_state.answers[i] = user_choice
-    if user_choice == quiz_data['correct_answer']:
-        st.session_state.feedback[i] = ("Correct", quiz_data.get('explanation', 'No explanation available'))
-        st.session_state.correct_answers += 1
-    else:
-        st.session_state.feedback[i] = ("Incorrect", quiz_data.get('explanation', 'No explanation available'), quiz_data['correct_answer'])
-
-def mc_quiz_app():
-    st.title('Multiple Choice Game')
-
-    questions = st.session_state.generated_questions
-    current_index = st.session_state.current_question_index
-
-    if questions:
-        if 'answers' not in st.session_state:
-            st.session_state.answers = [None] * len(questions)
-            st.session_state.feedback = [None] * len(questions)
-            st.session_state.correct_answers = 0
-
-        # Calculate progress and display the progress bar
-        progress = (current_index + 1) / len(questions)
-        st.progress(progress)
-        
-        quiz_data = questions[current_index]
-        st.markdown(f"### Question {current_index + 1} of {len(questions)}: {quiz_data['question']}")
-
-        # Display answer choices and buttons for navigation
-        if st.session_state.answers[current_index] is None:
-            user_choice = st.radio("Choose an answer:", quiz_data['choices'], key=f"user_choice_{current_index}")
-            st.button("Submit", on_click=submit_answer, args=(current_index, quiz_data))
-        else:
-            selected_index = quiz_data['choices'].index(st.session_state.answers[current_index]) if st.session_state.answers[current_index] in quiz_data['choices'] else 0
-            st.radio("Choose an answer:", quiz_data['choices'], key=f"user_choice_{current_index}", index=selected_index, disabled=True)
-
-            if st.session_state.feedback[current_index][0] == "Correct":
-                st.success(st.session_state.feedback[current_index][0])
-            else:
-                st.error(f"{st.session_state.feedback[current_index][0]} - Correct answer: {st.session_state.feedback[current_index][2]}")
-            st.markdown(f"Explanation: {st.session_state.feedback[current_index][1]}")
-
-        # Check if this is the last question and if the answer has been submitted
-        if current_index + 1 == len(questions) and st.session_state.answers[current_index] is not None:
-            # Show loading spinner and then the score screen
-            with st.spinner("Calculating your score..."):
-                time.sleep(2)  # Simulate processing time
-
-            # Score display screen with trophy and styled message
-            score = st.session_state.correct_answers
-            total_questions = len(questions)
-            st.markdown(
-                f"""
-                <div style="display: flex; flex-direction: column; align-items: center; justify-content: center; height: 100vh;">
-                    <h1 style="font-size: 3em; color: gold;">🏆</h1>
-                    <h1>Your Score: {score}/{total_questions}</h1>
-                    <p style="font-size: 1.5em; color: #4CAF50;">Well done! You’ve completed the quiz.</p>
-                </div>
-                """, 
-                unsafe_allow_html=True
-            )
-
-            st.session_state.quiz_active = False
-        elif st.button("Next Question") and current_index + 1 < len(questions):
-            # If not on the last question, proceed to the next one
-            st.session_state.current_question_index += 1
-            st.rerun()
-
-
-
-
-def download_pdf_app():
-    st.title('Download Your Exam as PDF')
-
-    questions = st.session_state.generated_questions
-
-    if questions:
-        for i, q in enumerate(questions):
-            st.markdown(f"### Q{i+1}: {q['question']}")
-            for choice in q['choices']:
-                st.write(choice)
-            st.write(f"**Correct answer:** {q['correct_answer']}")
-            st.write(f"**Explanation:** {q['explanation']}")
-            st.write("---")
-
-        pdf_bytes = generate_pdf(questions)
-        st.download_button(
-            label="Download PDF",
-            data=pdf_bytes,
-            file_name="generated_exam.pdf",
-            mime="application/pdf"
-        )
-
-if __name__ == '__main__':
-    main()
+import streamlit as st
+import time  # Import the time module to use sleep
+
+# This must be the first Streamlit command
+st.set_page_config(page_title="SmartExam Creator", page_icon="📝")
+
+from st_supabase_connection import SupabaseConnection
+from stqdm import stqdm
+from supabase import Client
+from openai import NOT_GIVEN, OpenAIError, RateLimitError
+import dotenv
+import os
+import json
+import tempfile
+import functools
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from streamlit_supabase_auth import login_form, logout_button
+from st_pages import show_pages_from_config
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from smartexam.budget import QuestionBudget
+from smartexam.chunking import TokenChunker
+from smartexam.dedup import NearDuplicateFilter
+from smartexam.exam_store import iter_exams, settings_key
+from smartexam.export import EXPORT_FORMATS, iter_exam_zip
+from smartexam.jsonstream import iter_json_array
+from smartexam.pdf_text import count_pages, document_hash, join_pages, read_pdf_bytes
+from smartexam.pipeline import ExamStream, stream_exam_responses
+from smartexam.llm_cache import response_key
+from smartexam.questions import QUESTION_RESPONSE_FORMAT, choice_label, parse_questions
+from smartexam.resources import fetch_user_data, get_exam_jobs, get_exam_store, get_llm_response_cache, get_openai_client, get_pdf_exporter, get_pdf_text_cache, get_supabase_client, record_usage, setting, show_llm_cache_stats, show_openai_pool_stats, show_pdf_cache_stats, show_user_data_stats, verified_session
+from smartexam.summarize import MapReduceSummarizer
+
+__version__ = "1.1.0"
+
+show_pages_from_config()
+
+hide_streamlit_style = """
+<style>
+div[data-testid="stToolbar"] {
+visibility: hidden;
+height: 0%;
+position: fixed;
+}
+div[data-testid="stDecoration"] {
+visibility: hidden;
+height: 0%;
+position: fixed;
+}
+div[data-testid="stStatusWidget"] {
+visibility: hidden;
+height: 0%;
+position: fixed;
+}
+#MainMenu {
+visibility: hidden;
+height: 0%;
+}
+header {
+visibility: hidden;
+height: 0%;
+}
+footer {
+visibility: hidden;
+height: 0%;
+}
+</style>
+"""
+st.markdown(hide_streamlit_style, unsafe_allow_html=True)
+
+# Load environment variables
+dotenv.load_dotenv()
+
+hide_default_format = """
+       <style>
+       #MainMenu {visibility: hidden; }
+       footer {visibility: hidden;}
+       </style>
+       """
+st.markdown(hide_default_format, unsafe_allow_html=True)
+
+#Show info banner
+
+#Apis
+
+SUPABASE_URL = st.secrets["SUPABASE_URL"]
+SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
+supabase: Client = get_supabase_client()  # Created once per process
+
+# Resetting quiz state
+
+def reset_quiz_state():
+    """Resets the session state for a new quiz, ensuring fresh state for each new upload."""
+    st.session_state.answers = []
+    st.session_state.feedback = []
+    st.session_state.correct_answers = 0
+    st.session_state.mc_test_generated = False
+    st.session_state.generated_questions = []
+    st.session_state.content_text = None
+    st.session_state.current_question_index = 0
+    st.session_state.quiz_data = None
+    st.session_state.quiz_active = False
+    st.session_state.last_upload_content = ""
+    st.session_state.exam_stream = None
+    st.session_state.duplicate_filter = None
+    st.session_state.removed_duplicates = 0
+
+def initialize_app():
+    if "app_mode" not in st.session_state:
+        st.session_state.app_mode = "Upload PDF & Generate Questions"
+    if "quiz_active" not in st.session_state:
+        st.session_state.quiz_active = False
+
+def sidebar_reset_button():
+    if st.sidebar.button("New Exam"):
+        reset_quiz_state()
+        st.session_state.exam_job = None  # The next upload starts (or joins) a job of its own
+        st.session_state.app_mode = "Upload PDF & Generate Questions"
+        st.session_state.quiz_active = False
+        st.rerun()
+
+# Main app functions
+def usable_response(finish_reason, content, validate=None):
+    # Only complete answers go in the cache: a cut off or unparseable one would be served again on every retry
+    if finish_reason != "stop" or content is None:
+        return False
+    try:
+        return validate is None or bool(validate(content))
+    except ValueError:
+        return False
+
+def stream_llm_response(messages, model_params, api_key, raise_errors=False, use_cache=True, validate=None):
+    model = model_params.get("model", "gpt-4o")       #Test change to 4o
+    temperature = model_params.get("temperature", 0.3)
+    max_tokens = model_params.get("max_tokens", 4096)
+    response_format = model_params.get("response_format")  # e.g. a structured output schema
+
+    # Identical requests (e.g. the same lecture uploaded again) are answered from the cache.
+    # With use_cache=False the cache is skipped, but the fresh response still replaces the cached one.
+    cache = get_llm_response_cache()
+    cache_key = response_key(model, messages, temperature, max_tokens, response_format)
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    client = get_openai_client(api_key)
+    retries = 5  # Maximum number of retries
+    jitter = 0.5  # Fixed jitter value to prevent synchronized retries
+    for attempt in range(retries):
+        try:
+            # Attempt the request
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                response_format=response_format or NOT_GIVEN,
+            )
+            content = response.choices[0].message.content
+            if usable_response(response.choices[0].finish_reason, content, validate):
+                cache.put(cache_key, content, response.usage)
+            return content  # Return on success
+        except RateLimitError:
+            # Handle rate limiting errors with backoff
+            if attempt < retries - 1:  # Don't retry after the last attempt
+                wait_time = (2 ** attempt) + jitter  # Exponential backoff with fixed jitter
+                st.warning(f"Rate limit hit. Retrying in {wait_time:.2f} seconds...")
+                time.sleep(wait_time)
+            else:
+                if raise_errors:
+                    raise
+                st.error("Rate limit exceeded. Please try again later.")
+                st.stop()  # Gracefully stop execution
+        except OpenAIError as e:
+            # Handle other OpenAI errors
+            if raise_errors:
+                raise  # Let the caller retry (e.g. a single chunk of the exam)
+            st.error(f"OpenAI API error: {e}")
+            st.stop()
+
+
+def stream_llm_chunks(messages, model_params, api_key, use_cache=True, validate=None):
+    """Yield the response text piece by piece as the model writes it. Raises on API errors.
+
+    Shares its cache entries with stream_llm_response, so a cached response comes back as one piece.
+    The response is only cached if it was finished and ``validate`` (if given) accepts it.
+    """
+    model = model_params.get("model", "gpt-4o")
+    temperature = model_params.get("temperature", 0.3)
+    max_tokens = model_params.get("max_tokens", 4096)
+    response_format = model_params.get("response_format")
+
+    cache = get_llm_response_cache()
+    cache_key = response_key(model, messages, temperature, max_tokens, response_format)
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    content = []
+    usage = None
+    finish_reason = None
+    for chunk in get_openai_client(api_key).chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        response_format=response_format or NOT_GIVEN,
+        stream=True,
+        stream_options={"include_usage": True},
+    ):
+        usage = chunk.usage or usage
+        if chunk.choices and chunk.choices[0].finish_reason:
+            finish_reason = chunk.choices[0].finish_reason
+        if chunk.choices and chunk.choices[0].delta.content:
+            content.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+    if usable_response(finish_reason, "".join(content), validate):
+        cache.put(cache_key, "".join(content), usage)
+
+
+def script_thread_pool(max_workers):
+    """Thread pool whose workers can use st.* calls (warnings, errors) of the current script run."""
+    ctx = get_script_run_ctx()
+    return ThreadPoolExecutor(
+        max_workers=max_workers,
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+    )
+
+
+# Function to fetch the subscription tier from Supabase
+def fetch_subscription_tier(user_id):
+    row = fetch_user_data(user_id)  # Cached for a few seconds and shared with the other pages
+    if row:
+        return row["subscription_tier"], row["mc_upload_count"]
+    else:
+        return None, None
+
+# Function to increment pdf_upload_count in the database
+def increment_mc_upload_count(user_id):
+    record_usage(user_id, "mc_upload_count")  # Sent to Supabase in the background
+
+def summarize_text(text, api_key=st.secrets["OPENAI_API_KEY"], raise_errors=False):
+    prompt = (
+        "Please summarize the following text to be concise and to the point:\n\n" + text
+    )
+    messages = [
+        {"role": "user", "content": prompt},
+    ]
+    summary = stream_llm_response(messages, model_params={"model": "gpt-4o", "temperature": 0.3}, api_key=api_key, raise_errors=raise_errors)              #Test change to 4o
+    return summary
+
+def merge_summaries(summaries, api_key=st.secrets["OPENAI_API_KEY"], raise_errors=False):
+    prompt = (
+        "The following are summaries of consecutive parts of the same lecture. "
+        "Merge them into one summary that is concise and to the point, keeping the order of the topics:\n\n"
+        + "\n\n---\n\n".join(summaries)
+    )
+    messages = [
+        {"role": "user", "content": prompt},
+    ]
+    return stream_llm_response(messages, model_params={"model": "gpt-4o", "temperature": 0.3}, api_key=api_key, raise_errors=raise_errors)
+
+# Questions come back as structured output: short keys and the index of the correct choice
+QUESTION_MODEL_PARAMS = {"model": "gpt-4o", "temperature": 0.3, "response_format": QUESTION_RESPONSE_FORMAT}
+
+def question_model_params(questions):
+    # Room for the requested questions, so a large share is not cut off (and a small one stays cheap)
+    return dict(QUESTION_MODEL_PARAMS, max_tokens=min(16000, 500 + 250 * questions))
+
+def mc_question_messages(content_text, questions=25):
+    prompt = (
+        f"You are a university professor. Using the provided lecture content, create a Master-level multiple-choice exam that includes {questions} questions. "
+        f"For every question give the question (q), four answer choices without letters in front (c), "
+        f"the index of the correct choice starting at 0 (a) and a short explanation (e).\n\n"
+        f"Content:\n\n{content_text}"
+    )
+    return [{"role": "user", "content": prompt}]
+
+def generate_mc_questions(content_text, api_key=st.secrets["OPENAI_API_KEY"], raise_errors=False, use_cache=True, questions=25):
+    messages = mc_question_messages(content_text, questions)
+    response = stream_llm_response(messages, model_params=question_model_params(questions), api_key=api_key, raise_errors=raise_errors, use_cache=use_cache, validate=parse_questions_json)
+    return response
+
+def parse_questions_json(response):
+    # Raises ValueError if the response holds no valid JSON; invalid questions are skipped
+    data = json.loads(response)
+    if isinstance(data, dict):
+        data = data.get("questions")
+    if not isinstance(data, list):
+        raise ValueError("The response holds no list of questions")
+    return parse_questions(data)
+
+def generate_chunk_questions(chunk, use_cache=True, questions=25):
+    """Generate and parse the questions for one chunk. Raises on failure so the pipeline can retry just this chunk."""
+    if not questions:
+        return []  # This chunk's share of the exam is zero
+    parsed = parse_questions_json(generate_mc_questions(chunk, raise_errors=True, use_cache=use_cache, questions=questions))
+    if not parsed:
+        raise ValueError("The model returned no questions for this chunk")
+    return parsed[:questions]
+
+def stream_chunk_questions(index, chunk, feed, api_key=st.secrets["OPENAI_API_KEY"], use_cache=True, questions=25):
+    """Add the questions of one chunk to the feed as soon as each one is complete. Raises on failure."""
+    if not questions:
+        return 0  # This chunk's share of the exam is zero
+    # A retry after a failure half way does not add the questions that were already published again
+    published = feed.count(index)
+    received = 0
+    pieces = stream_llm_chunks(mc_question_messages(chunk, questions), model_params=question_model_params(questions),
+                               api_key=api_key, use_cache=use_cache, validate=parse_questions_json)
+    for data in iter_json_array(pieces):
+        for question in parse_questions([data]):  # Skips (and logs) a question that is not usable
+            received += 1
+            if published < received <= questions:
+                feed.add(index, question)
+    if not received:
+        raise ValueError("The model returned no questions for this chunk")
+    return received
+
+def get_question(index, questions):
+    return questions[index]
+
+def initialize_session_state(questions):
+    session_state = st.session_state
+    session_state.current_question_index = 0
+    session_state.quiz_data = get_question(session_state.current_question_index, questions)
+    session_state.correct_answers = 0
+
+def generate_pdf(questions):
+    # Built with a Unicode font and cached by the exam's content, so reruns of the download page are free
+    return get_pdf_exporter().export(questions)
+
+# Integration with the main app
+def main():
+    initialize_app()  # Initialize app mode and quiz state tracking
+    sidebar_reset_button()  # Add "Neu Starten" button to sidebar for resetting state
+
+    session = login_form(
+        url=SUPABASE_URL,
+        apiKey=SUPABASE_KEY,
+        providers=["google"],
+    )
+    
+     # If the user is not logged in, stop the app
+    if not session:
+           st.stop()
+    session = verified_session(session)  # Checked from its access token; Supabase is only asked near the expiry
+    if not session:
+        st.error("Your login has expired. Please sign in again.")
+        logout_button()
+        st.stop()
+           
+
+
+    # Sidebar with logout button and user welcome message
+    with st.sidebar:
+        st.write(f"Welcome {session['user']['email']}")
+        logout_button()
+
+# Fetch and display the user's subscription tier and PDF upload count
+    user_id = session['user']['id']  # Get the user ID from the session
+    subscription_tier, mc_upload_count = fetch_subscription_tier(user_id)
+
+    
+    st.sidebar.write(f"Exams created: **{mc_upload_count}**")
+    show_user_data_stats()
+    show_openai_pool_stats()
+    show_pdf_cache_stats()
+    show_llm_cache_stats()
+
+# --- Check if the user has reached the usage limit ---
+# Only enforce usage limit if the subscription tier is "FREE"
+    if subscription_tier == "FREE":
+    # Check if the mc_upload_count is greater than or equal to 3
+        if mc_upload_count >= 100000:
+            st.error("You have reached your free usage limit. We want to give you a limited offer: only 19.99$ One-Time Payment for Lifetime Access to all functions.")
+
+        # Display the "Upgrade Now" button only when the limit is exceeded
+            if st.button("Upgrade Now"):
+            # Meta-refresh-based redirect
+                redirect_url = "https://smartexam.streamlit.app/Pricing"
+                st.markdown(f"""
+                    <meta http-equiv="refresh" content="0; url={redirect_url}">
+                """, unsafe_allow_html=True)
+
+            st.stop()  # Stop further interaction if the limit is reached
+        else:
+            st.info("Welcome, the app is now completely FREE for everyone !")  # Allow access to free users with less than 3 uploads
+
+    elif subscription_tier in ["PREMIUM", "PRO"]:
+        st.success("Welcome, PREMIUM/PRO user! You have unlimited access to all features.")  # Handle PREMIUM/PRO users
+
+# Main app content
+    dotenv.load_dotenv()
+
+    st.sidebar.title("SmartExam Creator")
+
+    app_mode_options = ["Upload PDF & Generate Questions", "Take the Quiz", "Download as PDF"]
+    st.session_state.app_mode = st.sidebar.selectbox(
+        "Choose the app mode", 
+        app_mode_options, 
+        index=app_mode_options.index(st.session_state.app_mode), 
+        key="app_mode_select"
+    )
+
+    if st.session_state.app_mode == "Upload PDF & Generate Questions":
+        pdf_upload_app(user_id)
+    elif st.session_state.app_mode == "Take the Quiz" and st.session_state.quiz_active:
+        mc_quiz_app()
+    elif st.session_state.app_mode == "Download as PDF":
+        download_pdf_app()
+
+
+
+
+def lecture_summarizer(executor, max_in_flight):
+    return MapReduceSummarizer(
+        functools.partial(summarize_text, raise_errors=True),
+        functools.partial(merge_summaries, raise_errors=True),
+        executor,
+        section_chars=int(setting("SUMMARY_SECTION_CHARS", 12000)),
+        fan_in=int(setting("SUMMARY_FAN_IN", 4)),
+        max_depth=int(setting("SUMMARY_MAX_DEPTH", 2)),
+        max_fan_out=max_in_flight,
+    )
+
+def new_duplicate_filter():
+    # Near-identical questions from overlapping parts of the lecture are dropped; 0 turns this off
+    threshold = float(setting("EXAM_DEDUP_THRESHOLD", 0.6))
+    return NearDuplicateFilter(threshold) if threshold > 0 else None
+
+def exam_settings(chunker, exam_size):
+    # Everything that changes the questions generated from a lecture
+    return {
+        "questions": exam_size,
+        "chunk_tokens": chunker.max_tokens,
+        "overlap_tokens": chunker.overlap_tokens,
+        "dedup_threshold": float(setting("EXAM_DEDUP_THRESHOLD", 0.6)),
+    }
+
+def exam_job_key(doc_hash, settings, use_cache):
+    # Uploads of the same lecture with the same settings share one job
+    return json.dumps([doc_hash, settings_key(settings), use_cache])
+
+def store_exam(user_id, doc_hash, settings, questions, title):
+    try:
+        get_exam_store().save(user_id, doc_hash, settings, [q.to_dict() for q in questions], title)
+    except Exception:
+        # The exam can still be taken, it just has to be generated again next time
+        logging.getLogger(__name__).exception("Could not store the exam")
+
+def submit_exam_job(pdf_bytes, chunker, max_in_flight, use_cache, exam_size, user_id, title):
+    """Queue the exam generation as a background job and return the job id.
+
+    A job for the same lecture and settings that is still running is joined
+    instead, unless fresh questions were asked for. The finished exam is
+    stored for ``user_id`` and for every user who joined the job.
+    """
+    doc_hash = document_hash(pdf_bytes)
+    settings = exam_settings(chunker, exam_size)
+
+    def new_job():
+        executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="exam")
+        summarizer = lecture_summarizer(executor, max_in_flight)
+        duplicate_filter = new_duplicate_filter()
+        stream = ExamStream(
+            get_pdf_text_cache().iter_pages(pdf_bytes),
+            functools.partial(stream_chunk_questions, api_key=st.secrets["OPENAI_API_KEY"], use_cache=use_cache),
+            executor,
+            condense=summarizer.iter_summaries,
+            chunker=chunker,
+            max_in_flight=max_in_flight,
+            budget=QuestionBudget(exam_size, count_pages(pdf_bytes), covered=lambda: summarizer.covered_chars),
+            accept=duplicate_filter.add if duplicate_filter else None,
+            retry_kwargs={"use_cache": False},  # A retry asks the model again instead of the cache
+        )
+        owners = {}  # Users (and the names of their uploads) the finished exam is stored for
+        owners_lock = threading.Lock()
+        stored = threading.Event()
+
+        def join(owner_id, owner_title):
+            # False once the exam was stored; the joining user then stores it themselves
+            with owners_lock:
+                if stored.is_set():
+                    return False
+                owners.setdefault(str(owner_id), owner_title)
+                return True
+
+        def run():
+            questions = stream.run()
+            if stream.error is not None and not questions:
+                raise stream.error
+            with owners_lock:
+                stored_for = dict(owners)
+                stored.set()
+            if questions:
+                for owner_id, owner_title in stored_for.items():
+                    store_exam(owner_id, doc_hash, settings, questions, owner_title)
+            return {
+                "questions": [q.to_dict() for q in questions],
+                "failed_chunks": stream.failed_chunks,
+                "removed_duplicates": len(duplicate_filter.removed) if duplicate_filter else 0,
+                "has_text": bool(join_pages(stream.pages).strip()),
+            }
+
+        return (stream, duplicate_filter, join), run
+
+    key = exam_job_key(doc_hash, settings, use_cache)
+    jobs = get_exam_jobs()
+    job_id = jobs.submit(key, new_job, join=use_cache)
+    live = jobs.live(job_id)
+    if live is not None:
+        stream, _, join = live
+        if not join(user_id, title) and stream.feed.items:
+            store_exam(user_id, doc_hash, settings, stream.feed.items, title)
+    else:
+        # The joined job finished in the meantime
+        job = jobs.get(job_id)
+        if job is not None and job["status"] == "done" and job["result"]["questions"]:
+            store_exam(user_id, doc_hash, settings, parse_questions(job["result"]["questions"]), title)
+    return job_id
+
+def start_quiz(questions, user_id, count_upload=True):
+    st.session_state.generated_questions = questions
+    st.session_state.answers = [None] * len(questions)
+    st.session_state.feedback = [None] * len(questions)
+    st.session_state.correct_answers = 0
+    st.session_state.mc_test_generated = True
+    st.session_state.quiz_active = True
+    if count_upload:
+        increment_mc_upload_count(user_id)
+
+    st.session_state.app_mode = "Take the Quiz"
+    st.rerun()
+
+def open_stored_exam(exam, user_id, count_upload=True, title=None):
+    """Start the quiz with an exam from the store; no model call is needed.
+
+    ``title`` is the name of the upload, used for the copy in this user's past exams.
+    """
+    questions = parse_questions(exam["questions"])
+    if not questions:
+        return False
+    if exam["user_id"] != str(user_id):
+        # Generated for someone else; keep a copy in this user's past exams, under the name of their own upload
+        store_exam(user_id, exam["doc_hash"], exam["settings"], questions, title or exam["title"])
+    start_quiz(questions, user_id, count_upload)
+
+def past_exams_app(user_id):
+    exams = get_exam_store().list(user_id)
+    if not exams:
+        return
+    with st.expander(f"Your past exams ({len(exams)})"):
+        for exam in exams:
+            column_title, column_button = st.columns([4, 1])
+            column_title.write(f"**{exam['title'] or 'Untitled lecture'}** – {exam['question_count']} questions")
+            if column_button.button("Open", key=f"open_exam_{exam['id']}"):
+                reset_quiz_state()
+                stored = get_exam_store().get(exam["id"])
+                if stored is None or open_stored_exam(stored, user_id, count_upload=False) is False:
+                    st.error("This exam could not be opened.")
+
+        # All past exams at once, written to a file of this user piece by piece by a background job
+        formats = st.multiselect("Download all your exams as", EXPORT_FORMATS, default=["pdf", "csv"], key="bulk_export_formats")
+        max_exams = int(setting("EXPORT_MAX_EXAMS", 100))
+        st.caption(f"The ZIP holds your {max_exams} newest exams.")
+        if st.button("Prepare ZIP", disabled=not formats):
+            st.session_state.bulk_export = submit_export_job(user_id, formats, max_exams)
+        show_export_download()
+
+def export_path(user_id, formats):
+    # One file per user and choice of formats, replaced by the next export
+    directory = setting("EXPORT_DIR") or os.path.join(tempfile.gettempdir(), "smartexam-exports")
+    os.makedirs(directory, exist_ok=True)
+    name = hashlib.sha256(json.dumps([str(user_id), sorted(formats)]).encode("utf-8")).hexdigest()[:32]
+    return os.path.join(directory, f"{name}.zip")
+
+def submit_export_job(user_id, formats, max_exams):
+    """Queue the ZIP export of the newest ``max_exams`` exams of ``user_id`` and return the job id."""
+    path = export_path(user_id, formats)
+    store = get_exam_store()
+    pdf_exporter = get_pdf_exporter()
+
+    def new_job():
+        def run():
+            exam_ids = [exam["id"] for exam in store.list(user_id, limit=max_exams)]
+            temp = f"{path}.tmp"
+            with open(temp, "wb") as f:
+                for piece in iter_exam_zip(iter_exams(store, exam_ids), formats, pdf_exporter):
+                    f.write(piece)
+            os.replace(temp, path)
+            return {"path": path, "exams": len(exam_ids)}
+
+        return None, run
+
+    return get_exam_jobs().submit(json.dumps(["export", str(user_id), sorted(formats)]), new_job)
+
+def discard_export(path):
+    # Streamlit keeps the bytes of the button that was clicked, so the file is not needed any more
+    if os.path.exists(path):
+        os.remove(path)
+    st.session_state.bulk_export = None
+
+def show_export_download():
+    job_id = st.session_state.get("bulk_export")
+    if not job_id:
+        return
+    job = get_exam_jobs().get(job_id)
+    if job is None or job["status"] == "failed":
+        st.session_state.bulk_export = None
+        st.error("The export failed. Please try again.")
+    elif job["status"] != "done":
+        st.info("Your ZIP is being prepared in the background. You can keep using the app meanwhile.")
+        st.button("Check again")  # The rerun looks at the job again
+    elif os.path.exists(job["result"]["path"]):
+        # Read from disk only in the runs that show the button; nothing is kept in the session
+        with open(job["result"]["path"], "rb") as f:
+            st.download_button(f"Download ZIP ({job['result']['exams']} exams)", f, file_name="smartexam-exams.zip",
+                               mime="application/zip", on_click=discard_export, args=(job["result"]["path"],))
+    else:
+        st.session_state.bulk_export = None
+
+def attach_exam_job(job_id, user_id):
+    """Poll the job until its first question is in, then start the quiz with it.
+
+    A rerun (e.g. a changed widget) only stops the polling; the job keeps
+    running and the next run picks it up again by its id. A job without a
+    first question after ``EXAM_JOB_TIMEOUT_SECONDS`` is given up on.
+    """
+    jobs = get_exam_jobs()
+    timeout = float(setting("EXAM_JOB_TIMEOUT_SECONDS", 900))
+    status = st.empty()
+    while True:
+        job = jobs.get(job_id)
+        if job is None or job["status"] == "failed":
+            st.session_state.exam_job = None
+            status.error("Failed to generate questions from this lecture. Please try again.")
+            return
+        if job["status"] != "done" and time.time() - job["created"] > timeout:
+            jobs.fail(job_id, "timed out")  # So the next upload starts a new job instead of joining this one
+            st.session_state.exam_job = None
+            status.error("Generating questions from this lecture is taking too long. Please try again.")
+            return
+
+        live = jobs.live(job_id)
+        if live is not None:
+            stream, duplicate_filter, _ = live
+            if stream.feed.items:
+                # The question list keeps growing while the rest of the lecture is generated
+                st.session_state.exam_stream = stream
+                st.session_state.duplicate_filter = duplicate_filter
+                start_quiz(stream.feed.items, user_id)
+            status.info(f"Writing the first question... ({len(stream.pages)} page(s) read, "
+                        f"{stream.chunks_done} part(s) of the lecture done)")
+            stream.feed.wait(0, timeout=1)
+            continue
+
+        if job["status"] == "done":
+            result = job["result"]
+            questions = parse_questions(result["questions"])
+            if not questions:
+                st.session_state.exam_job = None
+                if not result["has_text"]:
+                    status.warning("Please upload a PDF to generate the interactive exam.")
+                else:
+                    status.error("Failed to generate questions from this lecture. Please try again.")
+                return
+            if result["failed_chunks"]:
+                st.warning(f"{result['failed_chunks']} part(s) of the lecture could not be turned into questions and were skipped.")
+            st.session_state.removed_duplicates = result["removed_duplicates"]
+            start_quiz(questions, user_id)
+
+        # Queued here, or running in another server process: its questions can only be read once it is done
+        status.info("Waiting for a free worker..." if job["status"] == "queued" else "Generating the exam...")
+        time.sleep(1)
+
+def sync_exam_stream():
+    """Make room for questions that arrived since the last run and wrap up a finished stream."""
+    questions = st.session_state.generated_questions
+    missing = len(questions) - len(st.session_state.answers)
+    st.session_state.answers.extend([None] * missing)
+    st.session_state.feedback.extend([None] * missing)
+
+    stream = st.session_state.get("exam_stream")
+    if stream is None or not stream.done:
+        return stream
+    if stream.failed_chunks:
+        st.warning(f"{stream.failed_chunks} part(s) of the lecture could not be turned into questions and were skipped.")
+    st.session_state.last_upload_content = join_pages(stream.pages)
+    st.session_state.exam_stream = None
+    return None
+
+def pdf_upload_app(user_id):
+    st.title("Upload Your Lecture - Create Your Test Exam")
+    st.subheader("Show Us the Slides and We do the Rest")
+
+    if 'messages' not in st.session_state:
+        st.session_state.messages = []
+    
+    past_exams_app(user_id)
+
+    exam_size = st.number_input("Number of questions", min_value=5, max_value=200, value=int(setting("EXAM_TARGET_QUESTIONS", 30)), step=5)
+    fresh_questions = st.checkbox("Generate fresh questions", help="Ignore questions generated earlier for the same lecture")
+    uploaded_pdf = st.file_uploader("Upload a PDF document of up to 100 pages", type=["pdf"])
+    if not uploaded_pdf:
+        st.warning("Please upload a PDF to generate the interactive exam.")
+        return
+
+    reset_quiz_state()  # Resets quiz state when a new PDF is uploaded
+    pdf_bytes = read_pdf_bytes(uploaded_pdf)
+    pages = []
+    max_in_flight = int(setting("EXAM_MAX_IN_FLIGHT", 4))
+    chunk_tokens = setting("EXAM_CHUNK_TOKENS")
+    chunker = TokenChunker(
+        max_tokens=int(chunk_tokens) if chunk_tokens else None,  # Defaults to the budget of the model
+        model="gpt-4o",
+        overlap_tokens=int(setting("EXAM_CHUNK_OVERLAP_TOKENS", 0)),
+    )
+    doc_hash = document_hash(pdf_bytes)
+    settings = exam_settings(chunker, exam_size)
+
+    # A lecture that was turned into an exam with these settings before is loaded from the store
+    if not fresh_questions:
+        exam = get_exam_store().find(doc_hash, settings, user_id)
+        if exam is not None and open_stored_exam(exam, user_id, title=uploaded_pdf.name) is not False:
+            return
+
+    def read_pages():
+        # Pages go into the pipeline while they are extracted; keep them for the session
+        for page in get_pdf_text_cache().iter_pages(pdf_bytes):
+            pages.append(page)
+            yield page
+
+    st.info("Generating the exam from the uploaded content. It will take just a minute...")
+    questions = []
+    failed_chunks = 0
+
+    if str(setting("EXAM_STREAM_QUESTIONS", "true")).lower() in ("1", "true", "yes"):
+        # The job id is kept in the session, so reruns poll the same job instead of starting over
+        key = exam_job_key(doc_hash, settings, not fresh_questions)
+        job = st.session_state.get("exam_job")
+        if job is None or job[0] != key:
+            job = (key, submit_exam_job(pdf_bytes, chunker, max_in_flight, not fresh_questions, exam_size,
+                                        user_id, uploaded_pdf.name))
+            st.session_state.exam_job = job
+        attach_exam_job(job[1], user_id)
+        return
+
+    # Long sections are summarized and merged, and chunks are sent to the model while later pages are
+    # still parsed, with up to max_in_flight calls at once. Results still come back in lecture order.
+    with script_thread_pool(max_in_flight) as executor:
+        summarizer = lecture_summarizer(executor, max_in_flight)
+        results = stream_exam_responses(
+            read_pages(),
+            functools.partial(generate_chunk_questions, use_cache=not fresh_questions),
+            condense=summarizer.iter_summaries,
+            budget=QuestionBudget(exam_size, count_pages(pdf_bytes), covered=lambda: summarizer.covered_chars),
+            chunker=chunker,
+            executor=executor,
+            max_in_flight=max_in_flight,
+            retry_kwargs={"use_cache": False},  # A retry asks the model again instead of the cache
+        )
+        for parsed_questions in stqdm(results, desc="Generating questions", unit="chunk"):
+            if parsed_questions is None:
+                failed_chunks += 1
+            else:
+                questions.extend(parsed_questions)
+
+    if failed_chunks:
+        st.warning(f"{failed_chunks} part(s) of the lecture could not be turned into questions and were skipped.")
+
+    duplicate_filter = new_duplicate_filter()
+    if duplicate_filter:
+        questions = duplicate_filter.filter(questions)
+    st.session_state.duplicate_filter = duplicate_filter
+
+    content_text = join_pages(pages)
+    st.session_state.last_upload_content = content_text  # Track the latest upload
+
+    if content_text.strip():
+        st.success("PDF content added to the session.")
+        if questions:
+            store_exam(user_id, doc_hash, settings, questions, uploaded_pdf.name)
+            st.session_state.generated_questions = questions
+            st.session_state.answers = [None] * len(questions)
+            st.session_state.feedback = [None] * len(questions)
+            st.session_state.correct_answers = 0
+            st.session_state.mc_test_generated = True
+            st.session_state.quiz_active = True  # Indicate quiz is ready to be taken
+            increment_mc_upload_count(user_id)
+            st.success("The game has been successfully created! Switching to the quiz mode...")
+
+            st.session_state.app_mode = "Take the Quiz"
+            st.rerun()
+        else:
+            st.error("Failed to parse the generated questions. Please check the OpenAI response.")
+    else:
+        st.warning("Please upload a PDF to generate the interactive exam.")
+
+def submit_answer(i, quiz_data):
+    user_choice = st.session_state[f"user_choice_{i}"]  # Index of the chosen answer
+    st.session_state.answers[i] = user_choice
+    explanation = quiz_data.explanation or 'No explanation available'
+    if user_choice == quiz_data.answer:
+        st.session_state.feedback[i] = ("Correct", explanation)
+        st.session_state.correct_answers += 1
+    else:
+        st.session_state.feedback[i] = ("Incorrect", explanation, quiz_data.correct_answer)
+
+def mc_quiz_app():
+    st.title('Multiple Choice Game')
+
+    questions = st.session_state.generated_questions
+    current_index = st.session_state.current_question_index
+
+    if questions:
+        if 'answers' not in st.session_state:
+            st.session_state.answers = [None] * len(questions)
+            st.session_state.feedback = [None] * len(questions)
+            st.session_state.correct_answers = 0
+        stream = sync_exam_stream()  # Questions may still be arriving
+        duplicate_filter = st.session_state.get("duplicate_filter")
+        removed = len(duplicate_filter.removed) if duplicate_filter else st.session_state.get("removed_duplicates", 0)
+        if removed:
+            st.caption(f"{removed} near-duplicate question(s) were left out of this exam.")
+
+        # Calculate progress and display the progress bar
+        progress = (current_index + 1) / len(questions)
+        st.progress(progress)
+        
+        quiz_data = questions[current_index]
+        total = f"{len(questions)}+" if stream is not None else len(questions)
+        if stream is not None:
+            st.caption(f"Generating questions: {stream.chunks_done} part(s) of the lecture done, "
+                       f"{len(stream.pages)} page(s) read")
+        st.markdown(f"### Question {current_index + 1} of {total}: {quiz_data.question}")
+
+        # Display answer choices and buttons for navigation
+        if st.session_state.answers[current_index] is None:
+            user_choice = st.radio("Choose an answer:", range(len(quiz_data.choices)), format_func=quiz_data.choices.__getitem__, key=f"user_choice_{current_index}")
+            st.button("Submit", on_click=submit_answer, args=(current_index, quiz_data))
+        else:
+            selected_index = st.session_state.answers[current_index]
+            st.radio("Choose an answer:", range(len(quiz_data.choices)), format_func=quiz_data.choices.__getitem__, key=f"user_choice_{current_index}", index=selected_index, disabled=True)
+
+            if st.session_state.feedback[current_index][0] == "Correct":
+                st.success(st.session_state.feedback[current_index][0])
+            else:
+                st.error(f"{st.session_state.feedback[current_index][0]} - Correct answer: {st.session_state.feedback[current_index][2]}")
+            st.markdown(f"Explanation: {st.session_state.feedback[current_index][1]}")
+
+        # The last question so far is answered, but more are being generated
+        if stream is not None and current_index + 1 == len(questions) and st.session_state.answers[current_index] is not None:
+            with st.spinner("Generating more questions..."):
+                stream.feed.wait(len(questions))
+            st.rerun()
+
+        # Check if this is the last question and if the answer has been submitted
+        if current_index + 1 == len(questions) and st.session_state.answers[current_index] is not None:
+            # Show loading spinner and then the score screen
+            with st.spinner("Calculating your score..."):
+                time.sleep(2)  # Simulate processing time
+
+            # Score display screen with trophy and styled message
+            score = st.session_state.correct_answers
+            total_questions = len(questions)
+            st.markdown(
+                f"""
+                <div style="display: flex; flex-direction: column; align-items: center; justify-content: center; height: 100vh;">
+                    <h1 style="font-size: 3em; color: gold;">🏆</h1>
+                    <h1>Your Score: {score}/{total_questions}</h1>
+                    <p style="font-size: 1.5em; color: #4CAF50;">Well done! You’ve completed the quiz.</p>
+                </div>
+                """, 
+                unsafe_allow_html=True
+            )
+
+            st.session_state.quiz_active = False
+        elif st.button("Next Question") and current_index + 1 < len(questions):
+            # If not on the last question, proceed to the next one
+            st.session_state.current_question_index += 1
+            st.rerun()
+
+
+
+
+def download_pdf_app():
+    st.title('Download Your Exam as PDF')
+
+    questions = st.session_state.generated_questions
+    if st.session_state.get("exam_stream") is not None:
+        st.info("The exam is still being generated. The download contains the questions written so far.")
+
+    if questions:
+        for i, q in enumerate(questions):
+            st.markdown(f"### Q{i+1}: {q.question}")
+            for j, choice in enumerate(q.choices):
+                st.write(f"{choice_label(j)} {choice}")
+            st.write(f"**Correct answer:** {choice_label(q.answer)} {q.correct_answer}")
+            st.write(f"**Explanation:** {q.explanation}")
+            st.write("---")
+
+        pdf_bytes = generate_pdf(questions)
+        st.download_button(
+            label="Download PDF",
+            data=pdf_bytes,
+            file_name="generated_exam.pdf",
+            mime="application/pdf"
+        )
+
+if __name__ == '__main__':
+    main()
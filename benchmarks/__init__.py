@@ -0,0 +1 @@
+"""Benchmarks for the document pipeline. Run them from the repository root."""
@@ -0,0 +1,87 @@
+"""Compare the character-based chunk_text with TokenChunker.
+
+Every chunk costs one question generation call, so the number of chunks is
+the number of calls. Input tokens include the fixed prompt around each
+chunk; output tokens assume the 25 questions per call the prompt asks for.
+
+    python -m benchmarks.bench_chunking [--pages 10 100 300] [--json]
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.corpus import lecture_pages
+from smartexam.chunking import CHUNK_TOKEN_BUDGETS, TokenChunker, chunk_text
+from smartexam.tokenizer import get_tokenizer
+
+PROMPT_TEMPLATE = (
+    "You are a university professor. Using the provided lecture content, create a Master-level multiple-choice "
+    "exam in strict JSON format that includes 25 questions. Ensure the structure is:\n\n"
+    "[{'question': '...', 'choices': ['...'], 'correct_answer': '...', 'explanation': '...'}, ...]\n\nContent:\n\n"
+)
+QUESTIONS_PER_CALL = 25
+OUTPUT_TOKENS_PER_QUESTION = 110
+
+
+def measure(name, chunks, tokenizer, seconds):
+    prompt_tokens = tokenizer.count(PROMPT_TEMPLATE)
+    sizes = [tokenizer.count(chunk) for chunk in chunks]
+    return {
+        "strategy": name,
+        "chunks": len(chunks),
+        "mean_chunk_tokens": round(sum(sizes) / len(sizes), 1) if sizes else 0,
+        "max_chunk_tokens": max(sizes, default=0),
+        "input_tokens": sum(sizes) + prompt_tokens * len(chunks),
+        "output_tokens": len(chunks) * QUESTIONS_PER_CALL * OUTPUT_TOKENS_PER_QUESTION,
+        "chunking_ms": round(seconds * 1000, 2),
+    }
+
+
+def run(page_counts, model="gpt-4o"):
+    tokenizer = get_tokenizer(model)
+    results = []
+    for page_count in page_counts:
+        pages = lecture_pages(page_count)
+        text = "\n".join(pages)
+        rows = []
+
+        start = time.perf_counter()
+        chunks = chunk_text(text)
+        rows.append(measure("chunk_text(2000 chars)", chunks, tokenizer, time.perf_counter() - start))
+
+        for overlap in (0, 200):
+            chunker = TokenChunker(model=model, tokenizer=tokenizer, overlap_tokens=overlap)
+            start = time.perf_counter()
+            chunks = list(chunker.iter_chunks(pages))
+            name = f"TokenChunker({chunker.max_tokens} tokens, overlap {overlap})"
+            rows.append(measure(name, chunks, tokenizer, time.perf_counter() - start))
+
+        for row in rows:
+            row["pages"] = page_count
+        results.extend(rows)
+    return {"tokenizer": tokenizer.name, "model": model, "budget": CHUNK_TOKEN_BUDGETS.get(model), "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 300])
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    report = run(args.pages, args.model)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"tokenizer: {report['tokenizer']}, model: {report['model']}")
+    print(f"{'pages':>5}  {'strategy':<40} {'chunks':>6} {'mean tok':>8} {'input tok':>9} {'output tok':>10} {'ms':>8}")
+    for row in report["results"]:
+        print(
+            f"{row['pages']:>5}  {row['strategy']:<40} {row['chunks']:>6} {row['mean_chunk_tokens']:>8} "
+            f"{row['input_tokens']:>9} {row['output_tokens']:>10} {row['chunking_ms']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Time the stages of the exam pipeline on synthetic PDFs, on their own and end to end.
+
+The corpora are PDFs of 10 to 1000 slide pages written with fpdf. The model
+is replaced by a stub that answers every chunk with a structured output
+response of the requested number of questions, so the numbers cover only
+our own code. Each stage runs ``--repeat`` times and the best and median
+times are reported.
+
+Stages: PDF text extraction (serial, worker processes, cache hit), chunking
+(``chunk_text`` and ``TokenChunker``), parsing the model responses (whole
+and streamed), near-duplicate removal, PDF export (built and cached) and the
+whole upload from PDF bytes to exported PDF.
+
+    python -m benchmarks.bench_pipeline [--pages 10 100 1000] [--output results.json] [--baseline old.json]
+
+With ``--baseline`` every stage is compared with an earlier ``--output``
+file, and the exit status is 1 when one is slower than ``--tolerance``
+times its baseline and by more than ``--min-ms`` (sub-millisecond stages
+are mostly noise).
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_question_schema import new_format, sample_questions
+from benchmarks.corpus import lecture_pdf
+from smartexam.budget import QuestionBudget
+from smartexam.chunking import TokenChunker, chunk_text
+from smartexam.dedup import NearDuplicateFilter
+from smartexam.export import ExamPdfExporter
+from smartexam.jsonstream import iter_json_array
+from smartexam.pdf_text import PdfExtractor, PdfTextCache, count_pages, extract_pages, join_pages
+from smartexam.pipeline import stream_exam_responses
+from smartexam.questions import parse_questions
+
+
+def timed(fn, repeat):
+    """Run ``fn`` ``repeat`` times; return its last result and the best and median time in ms."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, round(min(times), 3), round(statistics.median(times), 3)
+
+
+def parse_response(response):
+    # What parse_questions_json in the app does with a structured output response
+    data = json.loads(response)
+    if isinstance(data, dict):
+        data = data.get("questions")
+    return parse_questions(data)
+
+
+def stub_responses(chunks, exam_size):
+    """The response the stubbed model gives for every chunk, with the chunk's share of the exam."""
+    budget = QuestionBudget(exam_size, 1)
+    budget.track_pages(chunks)
+    responses = []
+    for i, chunk in enumerate(chunks):
+        responses.append(new_format(sample_questions(budget.allocate(chunk), seed=i)))
+    return responses
+
+
+def make_stub_generate(latency):
+    def generate(chunk, questions=25):
+        if latency:
+            time.sleep(latency)  # Stands in for the model call, which runs in parallel
+        return parse_response(new_format(sample_questions(questions, seed=len(chunk))))
+
+    return generate
+
+
+def end_to_end(data, exam_size, extractor, exporter, latency, max_in_flight):
+    """One upload: extract, chunk, generate (stubbed), parse, dedup and export the PDF."""
+    cache = PdfTextCache(extractor=extractor.iter_pages)  # Fresh, so the document is really read
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        results = stream_exam_responses(
+            cache.iter_pages(data),
+            make_stub_generate(latency),
+            chunker=TokenChunker(model="gpt-4o"),
+            executor=executor,
+            max_in_flight=max_in_flight,
+            budget=QuestionBudget(exam_size, count_pages(data)),
+        )
+        questions = [q for parsed in results if parsed for q in parsed]
+    questions = NearDuplicateFilter().filter(questions)
+    exporter.build(questions)
+    return questions
+
+
+def run(page_counts, repeat=3, exam_size=30, latency=0.0, max_in_flight=4, workers=None):
+    extractor = PdfExtractor(workers=workers)
+    exporter = ExamPdfExporter()
+    exporter.build(sample_questions(1))  # Reads the font once, as the running app does
+    results = []
+    try:
+        for page_count in page_counts:
+            data = lecture_pdf(page_count)
+            rows = []
+
+            def stage(name, fn, **extra):
+                result, best, median = timed(fn, repeat)
+                rows.append(dict({"pages": page_count, "stage": name, "best_ms": best, "median_ms": median}, **extra))
+                return result
+
+            pages = stage("extract (serial)", lambda: extract_pages(data))
+            extractor.extract_pages(data)  # Starts the worker processes outside the timing
+            # Small documents (or a single worker) take the serial path; the row says which one ran
+            if extractor.is_parallel(page_count):
+                stage("extract (parallel)", lambda: extractor.extract_pages(data), workers=extractor.workers)
+            else:
+                stage("extract (parallel off)", lambda: extractor.extract_pages(data), workers=1)
+            cache = PdfTextCache()
+            cache.get_pages(data)
+            stage("extract (cache hit)", lambda: cache.get_pages(data))
+
+            text = join_pages(pages)
+            stage("chunk_text", lambda: chunk_text(text))
+            chunker = TokenChunker(model="gpt-4o")
+            chunks = stage("TokenChunker", lambda: list(chunker.iter_chunks(pages)))
+
+            responses = stub_responses(chunks, exam_size)
+            questions = stage("parse", lambda: [q for response in responses for q in parse_response(response)],
+                              chunks=len(chunks))
+            rows[-1]["questions"] = len(questions)
+            stage("parse (streamed)", lambda: [
+                q for response in responses
+                for q in parse_questions(iter_json_array(response[i:i + 16] for i in range(0, len(response), 16)))
+            ])
+            stage("dedup", lambda: NearDuplicateFilter().filter(questions))
+
+            stage("generate_pdf (build)", lambda: exporter.build(questions))
+            exporter.export(questions)
+            stage("generate_pdf (cached)", lambda: exporter.export(questions))
+
+            stage("end to end", lambda: end_to_end(data, exam_size, extractor, exporter, latency, max_in_flight),
+                  model_latency_s=latency)
+            results.extend(rows)
+    finally:
+        extractor.shutdown()
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeat": repeat,
+        "exam_size": exam_size,
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance, min_ms=1.0):
+    """Rows of ``report`` with their baseline time; returns the rows and whether any regressed."""
+    before = {(row["pages"], row["stage"]): row["best_ms"] for row in baseline["results"]}
+    rows = []
+    regressed = False
+    for row in report["results"]:
+        old = before.get((row["pages"], row["stage"]))
+        ratio = round(row["best_ms"] / old, 2) if old else None
+        slower = ratio is not None and ratio > tolerance and row["best_ms"] - old > min_ms
+        regressed |= slower
+        rows.append(dict(row, baseline_ms=old, ratio=ratio, regressed=slower))
+    return rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--questions", type=int, default=30, help="exam size")
+    parser.add_argument("--model-latency", type=float, default=0.0, help="seconds the stubbed model takes per chunk")
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--workers", type=int, help="PDF extraction processes (default: number of CPUs)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="slowdown that counts as a regression")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="smallest slowdown in ms that counts as a regression")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    report = run(args.pages, args.repeat, args.questions, args.model_latency, args.max_in_flight, args.workers)
+    regressed = False
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["results"], regressed = compare(report, json.load(f), args.tolerance, args.min_ms)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"python {report['python']}, {report['platform']}, best of {report['repeat']}")
+        print(f"{'pages':>5}  {'stage':<24} {'best ms':>10} {'median ms':>10}" + ("  baseline   ratio" if args.baseline else ""))
+        for row in report["results"]:
+            line = f"{row['pages']:>5}  {row['stage']:<24} {row['best_ms']:>10} {row['median_ms']:>10}"
+            if args.baseline:
+                line += f"  {row['baseline_ms'] if row['baseline_ms'] is not None else '-':>8} {row['ratio'] or '-':>7}"
+                line += "  slower" if row["regressed"] else ""
+            print(line)
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
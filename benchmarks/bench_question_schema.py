@@ -0,0 +1,122 @@
+"""Output tokens per question: the old free-form JSON against the structured output schema.
+
+The old prompt got back an indented JSON list with long keys, letters in
+front of the choices and the full text of the correct choice repeated as
+the answer. The schema uses short keys, plain choices and the index of the
+correct choice, and structured outputs come back without indentation.
+
+No responses of the old prompt were kept, so by default both sides are
+rebuilt from the same sample questions and the old side is an estimate of
+what that prompt returned. With ``--old`` and ``--new`` recorded responses
+(one raw response text per file) are counted instead. Their questions are
+read the way the app reads each format, so a response with prose around the
+JSON or broken elements counts what the app actually got out of it.
+
+    python -m benchmarks.bench_question_schema [--questions 25] [--old FILE --new FILE] [--json]
+"""
+
+import argparse
+import json
+import random
+
+from benchmarks.corpus import lecture_pages
+from smartexam.jsonstream import iter_json_array
+from smartexam.questions import Question, choice_label, parse_questions
+from smartexam.tokenizer import get_tokenizer
+
+
+def sample_questions(count, seed=0):
+    rng = random.Random(seed)
+    sentences = sorted({
+        sentence.strip() + "." for page in lecture_pages(50, seed) for line in page.splitlines()[1:]
+        for sentence in line.lstrip("- ").split(".") if sentence.strip()
+    })
+    questions = []
+    for _ in range(count):
+        choices = tuple(rng.sample(sentences, 4))
+        questions.append(Question("Which statement about " + rng.choice(sentences).lower().rstrip(".") + " is correct?",
+                                  choices, rng.randrange(4), " ".join(rng.sample(sentences, 2))))
+    return questions
+
+
+def old_format(questions):
+    return "```json\n" + json.dumps([
+        {
+            "question": q.question,
+            "choices": [f"{choice_label(i)} {choice}" for i, choice in enumerate(q.choices)],
+            "correct_answer": f"{choice_label(q.answer)} {q.correct_answer}",
+            "explanation": q.explanation,
+        }
+        for q in questions
+    ], indent=4) + "\n```"
+
+
+def new_format(questions):
+    return json.dumps({"questions": [q.to_dict() for q in questions]}, separators=(",", ":"))
+
+
+def count_old(text):
+    # Like the app read the old prompt: every complete element of the first JSON array in the text
+    return sum(1 for _ in iter_json_array([text]))
+
+
+def count_new(text):
+    # Like the app reads structured output: the elements of the questions array that pass validation
+    return len(parse_questions(iter_json_array([text])))
+
+
+def run(count, model="gpt-4o", old=None, new=None):
+    """Compare the formats; ``old`` and ``new`` are recorded response texts, or None to rebuild them."""
+    tokenizer = get_tokenizer(model)
+    questions = sample_questions(count)
+    estimated = old is None
+    if estimated:
+        old = old_format(questions)
+    if new is None:
+        new = new_format(questions)
+    results = []
+    sides = (("free-form JSON" + (" (est.)" if estimated else ""), old, count_old),
+             ("structured schema", new, count_new))
+    for name, text, count_questions in sides:
+        tokens = tokenizer.count(text)
+        questions_in_text = count_questions(text)
+        if not questions_in_text:
+            raise ValueError(f"The app would not get any question out of the {name} response")
+        results.append({"format": name, "questions": questions_in_text, "output_tokens": tokens,
+                        "tokens_per_question": round(tokens / questions_in_text, 1)})
+    # Per question, as recorded responses need not hold the same number of questions
+    saved = 1 - results[1]["tokens_per_question"] / results[0]["tokens_per_question"]
+    return {"tokenizer": tokenizer.name, "model": model, "estimated": estimated, "saved": round(saved, 3),
+            "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=25)
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--old", help="a recorded response of the old free-form prompt")
+    parser.add_argument("--new", help="a recorded response with the structured output schema")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    recorded = {}
+    for side in ("old", "new"):
+        path = getattr(args, side)
+        if path:
+            with open(path, encoding="utf-8") as f:
+                recorded[side] = f.read()
+    report = run(args.questions, args.model, **recorded)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"tokenizer: {report['tokenizer']}, model: {report['model']}")
+    print(f"{'format':<22} {'questions':>9} {'output tok':>10} {'tok/question':>12}")
+    for row in report["results"]:
+        print(f"{row['format']:<22} {row['questions']:>9} {row['output_tokens']:>10} {row['tokens_per_question']:>12}")
+    print(f"saved per question: {report['saved']:.1%}")
+    if report["estimated"]:
+        print("(est.) the old format is rebuilt from the sample questions, not a recorded response")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Index build time and query latency of the Chat with PDF retrieval indexes.
+
+Also compares the prompt tokens of the retrieved passages with the tokens of
+the whole document, which is what every question used to cost. The dense
+index uses the local hashing embedder, so no API calls are made.
+
+    python -m benchmarks.bench_retrieval [--pages 100 1000 5000] [--queries 200] [--backend bm25|dense] [--json]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+from benchmarks.corpus import lecture_pages
+from smartexam.embeddings import DenseIndex, HashingEmbedder
+from smartexam.retrieval import BM25Index, format_passages, split_passages, tokenize
+from smartexam.tokenizer import get_tokenizer
+
+
+def build_index(pages, backend):
+    if backend == "dense":
+        return DenseIndex.build(split_passages(pages), HashingEmbedder())
+    return BM25Index.from_pages(pages)
+
+
+def run(page_counts, query_count=200, top_k=6, backend="bm25"):
+    tokenizer = get_tokenizer()
+    rng = random.Random(1)
+    results = []
+    for page_count in page_counts:
+        pages = lecture_pages(page_count)
+
+        start = time.perf_counter()
+        index = build_index(pages, backend)
+        build_seconds = time.perf_counter() - start
+
+        # Queries are made of words that occur in the corpus, like real questions about the lecture
+        vocabulary = sorted({term for term in tokenize(" ".join(pages[:50])) if not term.isdigit()})
+        latencies = []
+        context_tokens = []
+        for _ in range(query_count):
+            query = "What is the role of " + " ".join(rng.sample(vocabulary, 3)) + "?"
+            start = time.perf_counter()
+            hits = index.search(query, top_k=top_k)
+            latencies.append(time.perf_counter() - start)
+            context_tokens.append(tokenizer.count(format_passages(hits)))
+
+        latencies.sort()
+        results.append({
+            "pages": page_count,
+            "passages": len(index.passages),
+            "build_ms": round(build_seconds * 1000, 2),
+            "query_p50_ms": round(statistics.median(latencies) * 1000, 3),
+            "query_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+            "document_tokens": tokenizer.count("\n".join(pages)),
+            "context_tokens_mean": round(statistics.mean(context_tokens), 1),
+        })
+    return {"backend": backend, "tokenizer": tokenizer.name, "top_k": top_k, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=6)
+    parser.add_argument("--backend", choices=["bm25", "dense"], default="bm25")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    report = run(args.pages, args.queries, args.top_k, args.backend)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"backend: {report['backend']}, tokenizer: {report['tokenizer']}, top_k: {report['top_k']}")
+    print(f"{'pages':>6} {'passages':>8} {'build ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'doc tokens':>10} {'prompt tokens':>13}")
+    for row in report["results"]:
+        print(
+            f"{row['pages']:>6} {row['passages']:>8} {row['build_ms']:>9} {row['query_p50_ms']:>8} "
+            f"{row['query_p95_ms']:>8} {row['document_tokens']:>10} {row['context_tokens_mean']:>13}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Deterministic synthetic lecture text for the benchmarks."""
+
+import random
+
+_TOPICS = [
+    "cell membrane", "protein folding", "enzyme kinetics", "photosynthesis", "signal transduction",
+    "gene expression", "metabolic pathway", "ion channel", "immune response", "DNA replication",
+]
+_VERBS = ["regulates", "depends on", "is measured by", "increases", "inhibits", "is described by", "controls"]
+_OBJECTS = [
+    "the reaction rate", "the concentration gradient", "the binding affinity", "the membrane potential",
+    "the transcription factor", "the free energy", "the substrate", "the equilibrium constant",
+]
+
+
+def _sentence(rng):
+    words = [rng.choice(_TOPICS).capitalize(), rng.choice(_VERBS), rng.choice(_OBJECTS)]
+    if rng.random() < 0.5:
+        words += ["when", rng.choice(_OBJECTS), rng.choice(_VERBS), rng.choice(_OBJECTS)]
+    return " ".join(words) + "."
+
+
+def lecture_pages(page_count, seed=0):
+    """Return ``page_count`` slide texts with a title, bullet points and prose paragraphs."""
+    rng = random.Random(seed)
+    pages = []
+    for number in range(1, page_count + 1):
+        lines = [f"Lecture slide {number}: {rng.choice(_TOPICS).title()}", ""]
+        for _ in range(rng.randint(2, 5)):
+            lines.append("- " + _sentence(rng))
+        lines.append("")
+        for _ in range(rng.randint(1, 3)):
+            lines.append(" ".join(_sentence(rng) for _ in range(rng.randint(2, 6))))
+            lines.append("")
+        pages.append("\n".join(lines))
+    return pages
+
+
+def lecture_pdf(page_count, seed=0):
+    """The slides of ``lecture_pages`` as a PDF with one slide per page, as bytes."""
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(False)
+    for text in lecture_pages(page_count, seed):
+        pdf.add_page()
+        pdf.set_font("Arial", "", 10)
+        pdf.multi_cell(0, 5, text)
+    return pdf.output(dest="S").encode("latin1")
@@ -0,0 +1 @@
+"""Shared helpers used by the SmartExam app and its pages."""
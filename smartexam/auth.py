@@ -0,0 +1,109 @@
+"""Login sessions, checked by the claims of their access token.
+
+The login component hands every page run the browser's Supabase session.
+The expiry and the user of its access token are read from the token
+itself, without a round-trip (and its signature is checked too when the
+project's JWT secret is configured). Supabase is only asked once a token
+is close to its expiry, and that answer is kept until the token expires.
+"""
+
+import base64
+import binascii
+import json
+import logging
+import time
+
+from smartexam.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+def make_supabase_verifier(client):
+    """``verify(access_token)`` returning the user id of a valid token, or None."""
+    from gotrue.errors import AuthApiError
+
+    def verify(access_token):
+        try:
+            response = client.auth.get_user(access_token)
+        except AuthApiError:
+            return None
+        return response.user.id if response and response.user else None
+
+    return verify
+
+
+def token_claims(access_token, jwt_secret=None):
+    """The claims of a JWT, or None if it is malformed (or, with ``jwt_secret``, not signed with it)."""
+    if jwt_secret:
+        import jwt  # PyJWT
+
+        try:
+            return jwt.decode(access_token, jwt_secret, algorithms=["HS256"], options={"verify_aud": False})
+        except jwt.InvalidTokenError:
+            return None
+    try:
+        payload = access_token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except (IndexError, ValueError, binascii.Error):
+        return None
+    return claims if isinstance(claims, dict) else None
+
+
+class SessionCache:
+    """Checks login sessions locally and asks ``verify`` only about tokens close to their expiry.
+
+    ``leeway`` seconds before a token expires it is checked with ``verify``
+    once, and the answer is kept until the expiry. Tokens without an expiry
+    are always checked that way and kept for ``default_ttl`` seconds. A
+    session whose check fails or raises is rejected.
+    """
+
+    def __init__(self, verify, default_ttl=300, leeway=30, max_entries=10000, jwt_secret=None):
+        self.verify = verify
+        self.default_ttl = default_ttl
+        self.leeway = leeway
+        self.jwt_secret = jwt_secret
+        self.checks = 0
+        self.local = 0
+        self._tokens = LRUCache(max_entries, sizeof=lambda entry: 1)
+
+    def check(self, session):
+        """Return ``session`` if its token is valid and belongs to its user, otherwise None."""
+        token = session.get("access_token") if session else None
+        user_id = (session.get("user") or {}).get("id") if session else None
+        if not token or not user_id:
+            return None
+        claims = token_claims(token, self.jwt_secret)
+        if claims is None or claims.get("sub", user_id) != user_id:
+            return None
+
+        now = time.time()
+        expires_at = claims.get("exp") or session.get("expires_at")
+        if expires_at is not None:
+            if now >= float(expires_at):
+                return None
+            if now < float(expires_at) - self.leeway:
+                self.local += 1
+                return session
+
+        entry = self._tokens.get(token)
+        if entry is not None:
+            verified_user, valid_until = entry
+            if now < valid_until:
+                return session if verified_user == user_id else None
+            self._tokens.pop(token)
+
+        self.checks += 1
+        try:
+            verified_user = self.verify(token)
+        except Exception:
+            logger.warning("Could not verify the login session", exc_info=True)
+            return None
+        if verified_user is None:
+            return None
+        valid_until = float(expires_at) if expires_at is not None else now + self.default_ttl
+        self._tokens.put(token, (verified_user, valid_until))
+        return session if verified_user == user_id else None
+
+    def stats(self):
+        return {"checks": self.checks, "local": self.local, "cached": self._tokens.hits, "sessions": len(self._tokens)}
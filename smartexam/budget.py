@@ -0,0 +1,83 @@
+"""Splitting the exam size over the chunks of a lecture.
+
+Every chunk used to get the same fixed number of questions, so long decks
+produced hundreds of questions and short chunks were padded with filler.
+Instead, the user picks the size of the exam and each chunk gets a share of
+it in proportion to its size.
+
+Chunks are generated while the lecture is still being read (and maybe
+summarized), so the total size is not known when the first chunk is sent
+off. ``QuestionBudget`` keeps a running estimate of it. The raw size of the
+document is extrapolated from the pages read so far. The texts that reach
+the chunker are compared with the part of the raw document they cover,
+which gives the expected total size of the chunker input. Only the new
+content of a chunk counts, not the overlap it repeats from the one before.
+
+Allocation is the streaming form of largest-remainder rounding: a chunk
+gets ``round(total * share so far)`` minus what was already handed out, so
+the remainders carry over from chunk to chunk. Every chunk with content
+gets at least one question while the exam size allows it, and questions
+are held back for the chunks that are still expected, so an estimate that
+runs out early does not leave the end of the lecture without questions.
+"""
+
+import math
+
+
+class QuestionBudget:
+    """Hands out ``total`` questions to the chunks of a document of ``page_count`` pages.
+
+    ``track_pages`` wraps the raw page stream and ``track_texts`` the texts
+    that go into the chunker. ``covered`` returns how many raw characters the
+    texts pulled so far stand for, e.g. ``MapReduceSummarizer.covered_chars``
+    when the pages are summarized first. Without it every text stands for
+    itself.
+    """
+
+    def __init__(self, total, page_count, covered=None):
+        self.total = total
+        self.page_count = page_count
+        self.covered = covered
+        self.pages_read = 0
+        self.raw_chars = 0
+        self.text_chars = 0
+        self.covered_chars = 0
+        self.chunk_chars = 0
+        self.chunks = 0
+        self.allocated = 0
+
+    def track_pages(self, pages):
+        for page in pages:
+            self.pages_read += 1
+            self.raw_chars += len(page) + 1
+            yield page
+
+    def track_texts(self, texts):
+        for text in texts:
+            self.text_chars += len(text) + 1
+            self.covered_chars = self.covered() if self.covered else self.text_chars
+            yield text
+
+    def estimated_text_chars(self):
+        """Expected total size of the chunker input."""
+        raw_total = self.raw_chars
+        if 0 < self.pages_read < self.page_count:
+            raw_total = self.raw_chars * self.page_count / self.pages_read
+        if not raw_total or not self.covered_chars:
+            return self.text_chars
+        return self.text_chars * raw_total / min(self.covered_chars, raw_total)
+
+    def allocate(self, chunk, overlap_chars=0):
+        """Number of questions for the next chunk; its first ``overlap_chars`` repeat the previous chunk."""
+        self.chunks += 1
+        self.chunk_chars += max(0, len(chunk) - overlap_chars) + 1
+        expected = max(self.estimated_text_chars(), self.chunk_chars)
+        count = round(self.total * self.chunk_chars / expected) - self.allocated
+        # One question is held back for every chunk that is still expected
+        later = math.floor((expected - self.chunk_chars) / (self.chunk_chars / self.chunks) + 0.5)
+        count = min(count, self.total - self.allocated - later)
+        if chunk.strip() and self.allocated < self.total:
+            count = max(count, 1)
+        count = max(0, count)
+        self.allocated += count
+        return count
@@ -0,0 +1,194 @@
+"""Small in-process and on-disk caches shared by the app.
+
+The memory tier is a byte-bounded LRU, the disk tier stores one file per key
+in a directory. Both tiers can expire entries after a TTL. ``TieredCache``
+puts the two together and keeps hit/miss counters so the pages can report
+how well a cache is doing.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by the total size of its values in bytes.
+
+    With ``ttl`` (seconds), entries older than that are treated as missing.
+    """
+
+    def __init__(self, max_bytes, sizeof=len, ttl=None):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.ttl = ttl
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                value, size, expires = self._data[key]
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.current_bytes -= size
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self.current_bytes -= self._data.pop(key)[1]
+            # A value bigger than the whole cache would only evict everything else
+            if size > self.max_bytes:
+                return
+            expires = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._data[key] = (value, size, expires)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._data:
+                self.current_bytes -= self._data.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    """Stores bytes values as ``<key><suffix>`` files in a directory.
+
+    When ``max_bytes`` is set, the least recently written files are removed
+    once the directory grows past that size. With ``ttl`` (seconds), files
+    written longer ago than that are treated as missing and removed.
+    """
+
+    def __init__(self, directory, max_bytes=None, suffix=".bin", ttl=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if self.ttl is not None and os.path.getmtime(path) + self.ttl < time.time():
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, data):
+        # Write to a temporary file first so readers never see half a value
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+        if self.max_bytes is not None:
+            self._evict()
+
+    def pop(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class TieredCache:
+    """Memory LRU in front of an optional disk tier.
+
+    ``dumps``/``loads`` convert values to and from the bytes stored on disk.
+    Disk hits are promoted back into memory. ``ttl`` applies to both tiers.
+    """
+
+    def __init__(self, max_bytes, dumps, loads, sizeof=len, disk_dir=None, disk_max_bytes=None, suffix=".bin",
+                 ttl=None):
+        self.memory = LRUCache(max_bytes, sizeof=sizeof, ttl=ttl)
+        self.disk = DiskCache(disk_dir, max_bytes=disk_max_bytes, suffix=suffix, ttl=ttl) if disk_dir else None
+        self.dumps = dumps
+        self.loads = loads
+        self.disk_hits = 0
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+        data = self.disk.get(key)
+        if data is None:
+            return None
+        value = self.loads(data)
+        self.disk_hits += 1
+        self.memory.put(key, value)
+        return value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, self.dumps(value))
+
+    def pop(self, key):
+        self.memory.pop(key)
+        if self.disk is not None:
+            self.disk.pop(key)
+
+    def stats(self):
+        """Hit/miss counters; a disk hit counts as a memory miss."""
+        misses = self.memory.misses - self.disk_hits
+        lookups = self.memory.hits + self.memory.misses
+        return {
+            "hits": self.memory.hits + self.disk_hits,
+            "memory_hits": self.memory.hits,
+            "disk_hits": self.disk_hits,
+            "misses": misses,
+            "hit_rate": (lookups - misses) / lookups if lookups else 0.0,
+            "entries": len(self.memory),
+            "memory_bytes": self.memory.current_bytes,
+            "max_bytes": self.memory.max_bytes,
+        }
@@ -0,0 +1,186 @@
+"""Splitting lecture text into chunks for question generation.
+
+Every chunk costs one question generation call, so chunks are packed as
+close to a per-model token budget as the slide, paragraph and sentence
+boundaries allow.
+"""
+
+import re
+
+from smartexam.tokenizer import get_tokenizer
+
+# Token budget of one chunk of lecture content, per model
+CHUNK_TOKEN_BUDGETS = {
+    "gpt-4o": 3000,
+    "gpt-4o-mini": 3000,
+    "gpt-4-turbo": 3000,
+    "gpt-3.5-turbo-16k": 2000,
+}
+DEFAULT_CHUNK_TOKENS = 2000
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def chunk_text(text, max_tokens=2000):
+    # Character-based chunker used before TokenChunker, kept as the benchmark baseline
+    sentences = text.split('. ')
+    chunks = []
+    chunk = ""
+    for sentence in sentences:
+        if len(chunk) + len(sentence) > max_tokens:
+            chunks.append(chunk)
+            chunk = sentence + ". "
+        else:
+            chunk += sentence + ". "
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class TokenChunker:
+    """Packs pages of text into chunks of at most ``max_tokens`` tokens.
+
+    Pages (slides) are split into paragraphs, paragraphs that do not fit the
+    budget into sentences, and sentences that still do not fit into runs of
+    words. The pieces are packed greedily. A new chunk starts at a slide
+    boundary instead of in the middle of a slide once the current chunk is
+    ``slide_break_ratio`` full. With ``overlap_tokens``, each chunk starts
+    with the last sentences of the previous one.
+
+    A chunk is not closed with less than ``min_tokens`` of new content while
+    some of its overlap can be dropped instead. When the document ends with
+    less than ``min_tokens`` of new content, it is added to the previous
+    chunk, which can then run over ``max_tokens`` by that much.
+    """
+
+    def __init__(
+        self, max_tokens=None, model="gpt-4o", tokenizer=None, overlap_tokens=0, slide_break_ratio=0.8, min_tokens=None
+    ):
+        self.tokenizer = tokenizer or get_tokenizer(model)
+        self.max_tokens = max_tokens or CHUNK_TOKEN_BUDGETS.get(model, DEFAULT_CHUNK_TOKENS)
+        self.overlap_tokens = min(overlap_tokens, self.max_tokens // 2)
+        self.slide_break_ratio = slide_break_ratio
+        self.min_tokens = self.max_tokens // 10 if min_tokens is None else min_tokens
+
+    def count(self, text):
+        return self.tokenizer.count(text)
+
+    def _split_words(self, sentence):
+        words = sentence.split()
+        run = []
+        size = 0
+        for word in words:
+            # The space before a word is usually part of its first token, so it is not counted on its own
+            tokens = self.count(" " + word) if run else self.count(word) + 1
+            if run and size + tokens > self.max_tokens:
+                yield " ".join(run), size
+                run = []
+                size = 0
+            run.append(word)
+            size += tokens
+        if run:
+            yield " ".join(run), size
+
+    def _pieces(self, page):
+        """Split a page into (separator, text, tokens) pieces that each fit the budget."""
+        pieces = []
+        for paragraph in _PARAGRAPH_RE.split(page):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            tokens = self.count(paragraph) + 1
+            if tokens <= self.max_tokens:
+                pieces.append(("\n\n", paragraph, tokens))
+                continue
+            separator = "\n\n"
+            for sentence in _SENTENCE_RE.split(paragraph):
+                tokens = self.count(sentence) + 1
+                parts = [(sentence, tokens)] if tokens <= self.max_tokens else self._split_words(sentence)
+                for text, tokens in parts:
+                    pieces.append((separator, text, tokens))
+                    separator = " "
+        return pieces
+
+    def _overlap(self, pieces):
+        if not self.overlap_tokens:
+            return []
+        sentences = []
+        size = 0
+        for _, text, _ in reversed(pieces):
+            for sentence in reversed(_SENTENCE_RE.split(text)):
+                tokens = self.count(sentence) + 1
+                if size + tokens > self.overlap_tokens:
+                    return sentences
+                sentences.insert(0, (" ", sentence, tokens))
+                size += tokens
+        return sentences
+
+    @staticmethod
+    def _join(pieces):
+        parts = [pieces[0][1]]
+        for separator, piece, _ in pieces[1:]:
+            parts.append(separator)
+            parts.append(piece)
+        return "".join(parts)
+
+    def _emit(self, pieces, overlap):
+        return self._join(pieces), len(self._join(pieces[:overlap])) if overlap else 0
+
+    def _trim_overlap(self, current, size, overlap, needed):
+        """Drop overlap from the start of a chunk with little new content until ``needed`` more tokens fit."""
+        new_tokens = sum(tokens for _, _, tokens in current[overlap:])
+        while overlap and new_tokens < self.min_tokens and size + needed > self.max_tokens:
+            size -= current.pop(0)[2]
+            overlap -= 1
+        return current, size, overlap
+
+    def iter_chunks(self, pages):
+        """Yield chunks of ``pages`` as soon as they are full; pages are read lazily."""
+        for chunk, _ in self.iter_chunks_with_overlap(pages):
+            yield chunk
+
+    def iter_chunks_with_overlap(self, pages):
+        """Like ``iter_chunks``, but yield ``(chunk, overlap_chars)``: the length of the repeated start of the chunk."""
+        current = []
+        size = 0
+        overlap = 0  # Number of pieces at the start of the current chunk repeated from the previous one
+        previous = None  # Held back by one chunk, so a short end of the document can be added to it
+        fresh = False  # Whether the current chunk holds more than the overlap
+        for page in pages:
+            pieces = self._pieces(page)
+            page_tokens = sum(tokens for _, _, tokens in pieces)
+            if fresh and size + page_tokens > self.max_tokens and size >= self.slide_break_ratio * self.max_tokens:
+                if previous:
+                    yield self._emit(*previous)
+                previous = current, overlap
+                current = self._overlap(current)
+                size, overlap, fresh = sum(tokens for _, _, tokens in current), len(current), False
+            for piece in pieces:
+                if fresh and size + piece[2] > self.max_tokens:
+                    current, size, overlap = self._trim_overlap(current, size, overlap, piece[2])
+                if fresh and size + piece[2] > self.max_tokens:
+                    if previous:
+                        yield self._emit(*previous)
+                    previous = current, overlap
+                    current = self._overlap(current)
+                    size, overlap, fresh = sum(tokens for _, _, tokens in current), len(current), False
+                if size + piece[2] > self.max_tokens:
+                    # The overlap leaves no room for this piece
+                    current, size, overlap = [], 0, 0
+                current.append(piece)
+                size += piece[2]
+                fresh = True
+        if fresh:
+            tail = current[overlap:]
+            if previous and sum(tokens for _, _, tokens in tail) < self.min_tokens:
+                previous = previous[0] + tail, previous[1]
+            else:
+                if previous:
+                    yield self._emit(*previous)
+                previous = current, overlap
+        if previous:
+            yield self._emit(*previous)
+
+    def chunk(self, text):
+        return list(self.iter_chunks([text]))
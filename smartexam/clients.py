@@ -0,0 +1,118 @@
+"""Shared OpenAI clients with pooled HTTP connections.
+
+Creating an ``OpenAI`` client per call means a new connection pool, and with
+it a fresh TCP and TLS handshake, for every request. The pool below keeps
+one client per API key for the whole process, with tuned connection limits,
+keep-alive and timeouts, and counts how many requests reused a connection.
+API keys are typed in by users, so only the most recently used
+``max_clients`` clients are kept, under a hash of their key.
+"""
+
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+import httpx
+from openai import OpenAI
+
+
+class ConnectionStats:
+    """Counts requests and newly opened connections of one or more transports."""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self._seen = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def record(self, connections):
+        with self._lock:
+            self.requests += 1
+            for connection in connections:
+                if connection not in self._seen:
+                    self._seen.add(connection)
+                    self.connections_opened += 1
+
+    def as_dict(self):
+        with self._lock:
+            reused = max(0, self.requests - self.connections_opened)
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "requests_on_reused_connections": reused,
+                "reuse_rate": reused / self.requests if self.requests else 0.0,
+            }
+
+
+class CountingTransport(httpx.HTTPTransport):
+    """HTTP transport that reports every request and its pool's connections to ``stats``."""
+
+    def __init__(self, stats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request):
+        response = super().handle_request(request)
+        self.stats.record(self._pool.connections)
+        return response
+
+
+def api_key_id(api_key):
+    """A hash of ``api_key`` to key caches by, so the key itself is not used as one."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest() if api_key else None
+
+
+class OpenAIClientPool:
+    """One long-lived ``OpenAI`` client per API key, for the ``max_clients`` most recently used keys.
+
+    Evicted clients are closed. Hold on to a client only for the requests at hand
+    and get it from the pool again later.
+    """
+
+    def __init__(self, max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0,
+                 timeout=120.0, connect_timeout=10.0, http2=False, max_retries=2, max_clients=64):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.http2 = http2
+        self.max_retries = max_retries
+        self.max_clients = max_clients
+        self.evicted = 0
+        self.connection_stats = ConnectionStats()
+        self._clients = OrderedDict()  # api_key_id -> client, least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, api_key):
+        key_id = api_key_id(api_key)
+        evicted = []
+        with self._lock:
+            client = self._clients.get(key_id)
+            if client is None:
+                transport = CountingTransport(self.connection_stats, limits=self.limits, http2=self.http2)
+                http_client = httpx.Client(transport=transport, timeout=self.timeout)
+                client = OpenAI(api_key=api_key, http_client=http_client, max_retries=self.max_retries)
+                self._clients[key_id] = client
+                while len(self._clients) > self.max_clients:
+                    evicted.append(self._clients.popitem(last=False)[1])
+                    self.evicted += 1
+            else:
+                self._clients.move_to_end(key_id)
+        for old in evicted:
+            old.close()
+        return client
+
+    def stats(self):
+        stats = self.connection_stats.as_dict()
+        stats["clients"] = len(self._clients)
+        stats["evicted_clients"] = self.evicted
+        return stats
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
@@ -0,0 +1,114 @@
+"""Near-duplicate question removal with MinHash and locality-sensitive hashing.
+
+Overlapping chunks and summaries of neighbouring sections make the model ask
+the same thing several times in slightly different words. Every question is
+turned into a set of character shingles and a MinHash signature. The
+signature is split into bands, and questions that share a band bucket are
+candidates. Only candidates are compared by their exact Jaccard similarity,
+so the cost grows roughly linearly with the number of questions instead of
+with the number of pairs. The filter is incremental: questions are checked
+against everything kept so far, in the order they arrive.
+"""
+
+import hashlib
+import re
+
+import numpy as np
+
+_PRIME = 4294967291  # Largest prime below 2**32, so a * h + b fits in 64 bits
+_SPACE_RE = re.compile(r"\W+")
+
+
+def question_text(question):
+    """The text a question is compared by: the question and its correct answer."""
+    return f"{question.question} {question.correct_answer}"
+
+
+def shingles(text, size=5):
+    text = _SPACE_RE.sub(" ", text.lower()).strip()
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def lsh_bands(threshold, num_perm):
+    """(bands, rows) with bands * rows <= num_perm whose S-curve crosses 50% closest to ``threshold``."""
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        crossing = (1 / bands) ** (1 / rows)
+        if best is None or abs(crossing - threshold) < abs(best[0] - threshold):
+            best = (crossing, bands, rows)
+    return best[1], best[2]
+
+
+class NearDuplicateFilter:
+    """Keeps the first of every group of questions that are at least ``threshold`` similar.
+
+    Similarity is the Jaccard index of character ``shingle_size``-grams of
+    ``key(item)`` (by default the question and its correct answer).
+    """
+
+    def __init__(self, threshold=0.6, num_perm=64, shingle_size=5, key=question_text, seed=1):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.key = key
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=self.bands * self.rows, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=self.bands * self.rows, dtype=np.uint64)
+        self._buckets = [{} for _ in range(self.bands)]
+        self._kept = []  # (text, shingles) of the kept items
+        self.seen = 0
+        self.removed = []  # (removed text, text of the kept item it duplicates, similarity)
+
+    def _signature(self, shingle_set):
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+             for s in shingle_set),
+            dtype=np.uint64,
+            count=len(shingle_set),
+        )
+        # (a * h + b) mod p for every permutation at once
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % np.uint64(_PRIME)
+        return permuted.min(axis=1)
+
+    def add(self, item):
+        """Return True and remember ``item`` if it is new, False if it is a near duplicate."""
+        self.seen += 1
+        text = self.key(item)
+        shingle_set = shingles(text, self.shingle_size)
+        signature = self._signature(shingle_set)
+        band_keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+        candidates = set()
+        for bucket, band_key in zip(self._buckets, band_keys):
+            candidates.update(bucket.get(band_key, ()))
+        for candidate in sorted(candidates):
+            similarity = jaccard(shingle_set, self._kept[candidate][1])
+            if similarity >= self.threshold:
+                self.removed.append((text, self._kept[candidate][0], round(similarity, 3)))
+                return False
+
+        position = len(self._kept)
+        self._kept.append((text, shingle_set))
+        for bucket, band_key in zip(self._buckets, band_keys):
+            bucket.setdefault(band_key, []).append(position)
+        return True
+
+    def filter(self, items):
+        return [item for item in items if self.add(item)]
+
+    def stats(self):
+        return {
+            "seen": self.seen,
+            "kept": len(self._kept),
+            "removed": len(self.removed),
+            "threshold": self.threshold,
+            "bands": self.bands,
+            "rows": self.rows,
+        }
@@ -0,0 +1,139 @@
+"""Dense (embedding) retrieval over the pages of a document.
+
+An alternative to the BM25 index for Chat with PDF. Passage embeddings are
+kept in one contiguous float32 matrix with unit-length rows, so a query is a
+single matrix-vector product followed by ``argpartition``. The matrix is
+saved as ``.npy`` under the document's content hash and memory-mapped when
+it is loaded again, so a known PDF is never embedded twice.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+import numpy as np
+
+from smartexam.retrieval import Passage, split_passages
+
+_TERM_RE = re.compile(r"\w+")
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class HashingEmbedder:
+    """Deterministic local embedder based on signed feature hashing of words.
+
+    Needs no network and gives the same vectors on every run, which makes it
+    a stand-in for the remote embedding API in tests and benchmarks.
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def __call__(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in _TERM_RE.findall(text.lower()):
+                digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                matrix[row, value % self.dim] += 1.0 if value & (1 << 63) else -1.0
+        return matrix
+
+
+class OpenAIEmbedder:
+    """Embeds texts with the OpenAI embeddings API, in batches.
+
+    ``client`` is an ``OpenAI`` client or a function returning one, e.g. to
+    take it from a pool on every call.
+    """
+
+    def __init__(self, client, model="text-embedding-3-small", batch_size=256):
+        self.client = client
+        self.model = model
+        self.batch_size = batch_size
+        self.name = model
+
+    def __call__(self, texts):
+        client = self.client() if callable(self.client) else self.client
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            response = client.embeddings.create(model=self.model, input=texts[start:start + self.batch_size])
+            vectors.extend(item.embedding for item in response.data)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class DenseIndex:
+    """Passages and their unit-length embeddings, searchable by cosine similarity."""
+
+    def __init__(self, matrix, passages, embedder):
+        self.matrix = matrix
+        self.passages = passages
+        self.embedder = embedder
+
+    @classmethod
+    def build(cls, passages, embedder):
+        if not passages:
+            return cls(np.zeros((0, 1), dtype=np.float32), passages, embedder)
+        matrix = _normalize_rows(embedder([passage.text for passage in passages]))
+        return cls(np.ascontiguousarray(matrix, dtype=np.float32), passages, embedder)
+
+    def search(self, query, top_k=5):
+        """Return up to ``top_k`` (score, passage) pairs, best first, like ``BM25Index.search``."""
+        if not self.passages or top_k <= 0:
+            return []
+        vector = _normalize_rows(self.embedder([query]))[0].astype(np.float32)
+        scores = self.matrix @ vector
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [(float(scores[i]), self.passages[i]) for i in best]
+
+
+class DenseIndexStore:
+    """Builds dense indexes once per document hash and embedder, and keeps them on disk."""
+
+    def __init__(self, directory, embedder, max_words=150, overlap_words=30):
+        self.directory = directory
+        self.embedder = embedder
+        self.max_words = max_words
+        self.overlap_words = overlap_words
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, doc_hash):
+        base = os.path.join(self.directory, f"{doc_hash}-{self.embedder.name}")
+        return base + ".npy", base + ".json"
+
+    def load(self, doc_hash):
+        """The stored index of ``doc_hash`` with a memory-mapped matrix, or None."""
+        matrix_path, passages_path = self._paths(doc_hash)
+        try:
+            with open(passages_path, encoding="utf-8") as f:
+                passages = [Passage(page, text) for page, text in json.load(f)]
+            matrix = np.load(matrix_path, mmap_mode="r")
+        except FileNotFoundError:
+            return None
+        return DenseIndex(matrix, passages, self.embedder)
+
+    def load_or_build(self, doc_hash, pages):
+        index = self.load(doc_hash)
+        if index is not None:
+            return index
+        index = DenseIndex.build(split_passages(pages, self.max_words, self.overlap_words), self.embedder)
+        matrix_path, passages_path = self._paths(doc_hash)
+        # Matrix first, passages last: load() only finds an index once both are complete
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".npy")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, index.matrix)
+        os.replace(tmp_path, matrix_path)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump([list(passage) for passage in index.passages], f)
+        os.replace(tmp_path, passages_path)
+        return self.load(doc_hash)
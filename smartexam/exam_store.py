@@ -0,0 +1,185 @@
+"""Generated exams, stored so a known lecture does not go through the model again.
+
+An exam is keyed by the document hash and the generation settings (exam
+size, chunking, dedup threshold). Every user gets their own row, so past
+exams can be listed and reopened, but a lookup by document and settings
+finds the exam of any user: the questions only depend on the lecture.
+
+``SqliteExamStore`` keeps everything in a local file. ``SupabaseExamStore``
+keeps it in a Supabase table with the same columns::
+
+    create table exams (
+        id uuid primary key default gen_random_uuid(),
+        user_id uuid not null,
+        doc_hash text not null,
+        settings_key text not null,
+        title text,
+        question_count integer not null,
+        questions jsonb not null,
+        created_at timestamptz not null default now(),
+        unique (user_id, doc_hash, settings_key)
+    );
+    create index exams_doc on exams (doc_hash, settings_key);
+
+Questions are stored as the dicts of ``Question.to_dict``.
+"""
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+
+
+def settings_key(settings):
+    """A stable string for a dict of generation settings."""
+    return json.dumps(settings, sort_keys=True, separators=(",", ":"))
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS exams (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    doc_hash TEXT NOT NULL,
+    settings_key TEXT NOT NULL,
+    title TEXT,
+    question_count INTEGER NOT NULL,
+    questions TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    UNIQUE (user_id, doc_hash, settings_key)
+)
+"""
+
+
+class SqliteExamStore:
+    """Exams in the SQLite database at ``path``."""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute(_SCHEMA)
+            db.execute("CREATE INDEX IF NOT EXISTS exams_doc ON exams (doc_hash, settings_key)")
+            db.execute("CREATE INDEX IF NOT EXISTS exams_user ON exams (user_id, created_at)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def save(self, user_id, doc_hash, settings, questions, title=None):
+        """Store the exam for ``user_id``, replacing their earlier one for the same document and settings."""
+        questions = list(questions)
+        with self._connect() as db:
+            return db.execute(
+                """INSERT INTO exams (id, user_id, doc_hash, settings_key, title, question_count, questions, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (user_id, doc_hash, settings_key) DO UPDATE SET
+                   title = excluded.title, question_count = excluded.question_count,
+                   questions = excluded.questions, created_at = excluded.created_at
+                   RETURNING id""",
+                (uuid.uuid4().hex, str(user_id), doc_hash, settings_key(settings), title, len(questions),
+                 json.dumps(questions), time.time()),
+            ).fetchone()[0]
+
+    def find(self, doc_hash, settings, user_id=None):
+        """The latest exam of a document with these settings, preferring one of ``user_id``; None if there is none."""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT * FROM exams WHERE doc_hash = ? AND settings_key = ? "
+                "ORDER BY user_id = ? DESC, created_at DESC LIMIT 1",
+                (doc_hash, settings_key(settings), str(user_id)),
+            ).fetchone()
+        return self._exam(row)
+
+    def get(self, exam_id):
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM exams WHERE id = ?", (exam_id,)).fetchone()
+        return self._exam(row)
+
+    def list(self, user_id, limit=20):
+        """The newest exams of ``user_id`` (all of them with ``limit=None``), without their questions."""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, user_id, doc_hash, title, question_count, created_at FROM exams "
+                "WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+                (str(user_id), -1 if limit is None else limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _exam(self, row):
+        if row is None:
+            return None
+        exam = dict(row)
+        exam["questions"] = json.loads(exam["questions"])
+        exam["settings"] = json.loads(exam.pop("settings_key"))
+        return exam
+
+
+class SupabaseExamStore:
+    """Exams in the Supabase ``table`` (see the module docstring for its definition)."""
+
+    def __init__(self, client, table="exams"):
+        self.client = client
+        self.table = table
+
+    def save(self, user_id, doc_hash, settings, questions, title=None):
+        questions = list(questions)
+        response = self.client.table(self.table).upsert(
+            {
+                "user_id": str(user_id),
+                "doc_hash": doc_hash,
+                "settings_key": settings_key(settings),
+                "title": title,
+                "question_count": len(questions),
+                "questions": questions,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            },
+            on_conflict="user_id,doc_hash,settings_key",
+        ).execute()
+        return response.data[0]["id"] if response.data else None
+
+    def find(self, doc_hash, settings, user_id=None):
+        query = (self.client.table(self.table).select("*")
+                 .eq("doc_hash", doc_hash).eq("settings_key", settings_key(settings)))
+        if user_id is not None:
+            own = query.eq("user_id", str(user_id)).order("created_at", desc=True).limit(1).execute()
+            if own.data:
+                return self._exam(own.data[0])
+            query = (self.client.table(self.table).select("*")
+                     .eq("doc_hash", doc_hash).eq("settings_key", settings_key(settings)))
+        response = query.order("created_at", desc=True).limit(1).execute()
+        return self._exam(response.data[0]) if response.data else None
+
+    def get(self, exam_id):
+        response = self.client.table(self.table).select("*").eq("id", exam_id).limit(1).execute()
+        return self._exam(response.data[0]) if response.data else None
+
+    def list(self, user_id, limit=20):
+        query = (self.client.table(self.table)
+                 .select("id", "user_id", "doc_hash", "title", "question_count", "created_at")
+                 .eq("user_id", str(user_id)).order("created_at", desc=True))
+        if limit is not None:
+            query = query.limit(limit)
+        return query.execute().data or []
+
+    def _exam(self, row):
+        exam = dict(row)
+        exam["settings"] = json.loads(exam.pop("settings_key"))
+        return exam
+
+
+def iter_exams(store, exam_ids):
+    """The stored exams with ``exam_ids``, loaded one at a time."""
+    for exam_id in exam_ids:
+        exam = store.get(exam_id)
+        if exam is not None:
+            yield exam
@@ -0,0 +1,265 @@
+"""Exam exports.
+
+``ExamPdfExporter`` writes an exam as a PDF with a Unicode TrueType font,
+so questions in any script come out as written instead of being forced
+into Latin-1. Reading the font's metrics is the slow part of building a
+document with fpdf, so it is done once per process and shared by every
+document. Finished PDFs are cached by a hash of the exam's content, so
+showing the download button again does not build the document again.
+
+``iter_exam_zip`` exports many stored exams at once as a ZIP archive (PDF,
+CSV, JSON and a tab separated file for Anki) that is produced piece by
+piece, so the memory use does not grow with the number of exams.
+"""
+
+import csv
+import hashlib
+import html
+import io
+import json
+import logging
+import os
+import re
+import threading
+import zipfile
+
+from fpdf import FPDF
+from fpdf.ttfonts import TTFontFile
+
+from smartexam.cache import LRUCache
+from smartexam.questions import choice_label, parse_questions
+
+logger = logging.getLogger(__name__)
+
+# DejaVu Sans ships with the package (see fonts/LICENSE), so the PDF does not depend on the system fonts
+DEFAULT_FONT = os.path.join(os.path.dirname(__file__), "fonts", "DejaVuSans.ttf")
+
+_font_lock = threading.Lock()
+_font_metrics = {}  # TTF path -> metrics, read once per process
+
+
+def font_metrics(path):
+    """The metrics fpdf needs to use the TrueType font at ``path``, read once per process."""
+    with _font_lock:
+        if path not in _font_metrics:
+            ttf = TTFontFile()
+            ttf.getMetrics(path)
+            _font_metrics[path] = {
+                "type": "TTF",
+                "name": re.sub("[ ()]", "", ttf.fullName),
+                "desc": {
+                    "Ascent": int(round(ttf.ascent)),
+                    "Descent": int(round(ttf.descent)),
+                    "CapHeight": int(round(ttf.capHeight)),
+                    "Flags": ttf.flags,
+                    "FontBBox": "[%s %s %s %s]" % tuple(int(round(value)) for value in ttf.bbox),
+                    "ItalicAngle": int(ttf.italicAngle),
+                    "StemV": int(round(ttf.stemV)),
+                    "MissingWidth": int(round(ttf.defaultWidth)),
+                },
+                "up": round(ttf.underlinePosition),
+                "ut": round(ttf.underlineThickness),
+                "cw": ttf.charWidths,
+                "ttffile": path,
+                "originalsize": os.stat(path).st_size,
+            }
+        return _font_metrics[path]
+
+
+def exam_hash(questions, title=""):
+    """Hash of everything that ends up in an exported exam."""
+    content = json.dumps([title, [q.to_dict() for q in questions]], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ExamPDF(FPDF):
+    """An exam document; ``fonts`` maps a style ("" or "B") to a TTF path, or is empty for Arial."""
+
+    def __init__(self, title, fonts):
+        super().__init__()
+        self._exam_title = title
+        self.family = "exam" if fonts else "Arial"
+        for style, path in fonts.items():
+            self._add_shared_font(style, path)
+        # fpdf writes the metadata without encoding it, so it has to stay Latin-1
+        self.set_title(title.encode("latin1", "replace").decode("latin1"))
+
+    def _add_shared_font(self, style, path):
+        # What FPDF.add_font(uni=True) sets up, without reading the font file for every document
+        fontkey = self.family + style
+        metrics = font_metrics(path)
+        self.fonts[fontkey] = {
+            "i": len(self.fonts) + 1,
+            "type": metrics["type"], "name": metrics["name"], "desc": metrics["desc"],
+            "up": metrics["up"], "ut": metrics["ut"], "cw": metrics["cw"],
+            "ttffile": path, "fontkey": fontkey,
+            "subset": list(range(0, 32)),  # Characters used by this document are added while writing
+            "unifilename": None,
+        }
+        self.font_files[fontkey] = {"length1": metrics["originalsize"], "type": "TTF", "ttffile": path}
+        self.font_files[path] = {"type": "TTF"}
+
+    def header(self):
+        self.set_font(self.family, "B", 12)
+        self.cell(0, 10, self._safe_text(self._exam_title), 0, 1, "C")
+
+    def _safe_text(self, text):
+        if self.family == "Arial":
+            # The core fonts only cover Latin-1
+            return text.replace("—", "-").encode("latin1", "replace").decode("latin1")
+        return text
+
+    def question(self, number, question):
+        self.set_font(self.family, "B", 12)
+        self.multi_cell(0, 10, self._safe_text(f"Q{number}: {question.question}"))
+        self.ln(5)
+        self.set_font(self.family, "", 12)
+        lines = [f"{choice_label(j)} {choice}" for j, choice in enumerate(question.choices)]
+        lines.append(f"Correct answer: {choice_label(question.answer)} {question.correct_answer}")
+        lines.append(f"Explanation: {question.explanation}")
+        self.multi_cell(0, 10, self._safe_text("\n".join(lines)))
+        self.ln()
+
+
+class ExamPdfExporter:
+    """Builds exam PDFs with the TrueType fonts at ``font_path`` (and ``bold_font_path``) and caches them.
+
+    Without a usable font the core Arial font is used, which only covers Latin-1.
+    """
+
+    def __init__(self, font_path=DEFAULT_FONT, bold_font_path=None, max_bytes=32 * 1024 * 1024):
+        self.fonts = {}
+        if font_path and os.path.exists(font_path):
+            if bold_font_path is None:
+                bold_font_path = font_path.replace(".ttf", "-Bold.ttf")
+            self.fonts = {"": font_path, "B": bold_font_path if os.path.exists(bold_font_path) else font_path}
+        else:
+            logger.warning("No TrueType font at %r; exam PDFs use Arial, which only covers Latin-1", font_path)
+        self.builds = 0
+        self._cache = LRUCache(max_bytes)
+
+    def build(self, questions, title="Generated Exam"):
+        self.builds += 1
+        pdf = ExamPDF(title, self.fonts)
+        pdf.add_page()
+        for i, question in enumerate(questions):
+            pdf.question(i + 1, question)
+        return pdf.output(dest="S").encode("latin1")
+
+    def export(self, questions, title="Generated Exam"):
+        """The PDF of ``questions``, built only the first time this content is exported."""
+        key = exam_hash(questions, title)
+        data = self._cache.get(key)
+        if data is None:
+            data = self.build(questions, title)
+            self._cache.put(key, data)
+        return data
+
+    def stats(self):
+        return {"builds": self.builds, "hits": self._cache.hits, "cached_bytes": self._cache.current_bytes,
+                "unicode": bool(self.fonts)}
+
+
+EXPORT_FORMATS = ("pdf", "csv", "json", "anki")
+CSV_COLUMNS = ["number", "question"] + [f"choice_{choice_label(i)[0]}" for i in range(6)] + ["answer", "explanation"]
+
+
+def export_name(exam):
+    """File name (without extension) of a stored exam in an export."""
+    title = os.path.splitext(exam.get("title") or "exam")[0]
+    slug = re.sub(r"[^\w-]+", "-", title).strip("-")[:60] or "exam"
+    return f"{slug}-{exam['id']}"  # The full id: two exams of one lecture share the slug
+
+
+def iter_csv(questions):
+    """CSV lines of an exam, one question per row with up to six choice columns."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for number, q in enumerate(questions, 1):
+        choices = list(q.choices) + [""] * (6 - len(q.choices))
+        writer.writerow([number, q.question] + choices + [choice_label(q.answer)[0], q.explanation])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _anki_field(text):
+    return html.escape(text).replace("\t", " ").replace("\r\n", "<br>").replace("\n", "<br>")
+
+
+def iter_anki(questions):
+    """Lines of a tab separated file that Anki imports as basic notes (front: question and choices)."""
+    yield "#separator:tab\n#html:true\n"
+    for q in questions:
+        front = "<br>".join([_anki_field(q.question)] + [
+            f"{choice_label(j)} {_anki_field(choice)}" for j, choice in enumerate(q.choices)
+        ])
+        back = f"{choice_label(q.answer)} {_anki_field(q.correct_answer)}"
+        if q.explanation:
+            back += f"<br><br>{_anki_field(q.explanation)}"
+        yield f"{front}\t{back}\n"
+
+
+def iter_json(exam, questions):
+    header = {key: exam.get(key) for key in ("id", "title", "doc_hash", "settings", "created_at")}
+    yield json.dumps(header, ensure_ascii=False)[:-1] + ', "questions": ['
+    for i, q in enumerate(questions):
+        yield ("," if i else "") + json.dumps(q.to_dict(), ensure_ascii=False)
+    yield "]}\n"
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only stream that collects what ``zipfile`` writes until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        if self._chunks:
+            data = b"".join(self._chunks)
+            self._chunks = []
+            yield data
+
+
+def iter_exam_zip(exams, formats=EXPORT_FORMATS, pdf_exporter=None):
+    """Yield a ZIP archive of ``exams`` piece by piece, with one file per exam and format.
+
+    ``exams`` is an iterable of stored exams (see ``smartexam.exam_store``)
+    and is read lazily, so only one exam is held at a time and the archive is
+    never in memory as a whole. Files go into one folder per format.
+    """
+    unknown = set(formats) - set(EXPORT_FORMATS)
+    if unknown:
+        raise ValueError(f"unknown export formats: {', '.join(sorted(unknown))}")
+    if "pdf" in formats and pdf_exporter is None:
+        pdf_exporter = ExamPdfExporter()
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for exam in exams:
+            questions = parse_questions(exam["questions"])
+            name = export_name(exam)
+            for export_format in formats:
+                if export_format == "pdf":
+                    # Built directly, so a bulk export does not push the single exams out of the PDF cache
+                    pieces = [pdf_exporter.build(questions, exam.get("title") or "Generated Exam")]
+                    path = f"pdf/{name}.pdf"
+                elif export_format == "csv":
+                    pieces, path = iter_csv(questions), f"csv/{name}.csv"
+                elif export_format == "json":
+                    pieces, path = iter_json(exam, questions), f"json/{name}.json"
+                else:
+                    pieces, path = iter_anki(questions), f"anki/{name}.txt"
+                with archive.open(path, "w") as entry:
+                    for piece in pieces:
+                        entry.write(piece.encode("utf-8") if isinstance(piece, str) else piece)
+                        yield from sink.drain()
+                yield from sink.drain()
+    yield from sink.drain()  # The central directory
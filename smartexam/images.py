@@ -0,0 +1,201 @@
+"""Preprocessing of uploaded images before they are sent to the model.
+
+Phone photos are several megabytes and much larger than what the vision
+models look at. Their high detail mode scales an image to fit 2048x2048 and
+then its shorter side down to 768 pixels. Anything beyond that is wasted
+bytes in the session state and in every request. Each upload is therefore
+rotated according to its EXIF data, downscaled to that size and re-encoded
+as JPEG. Results are cached by the hash of the raw upload, so the same image
+is only processed once. The PIL work runs in a shared thread pool.
+"""
+
+import base64
+import hashlib
+import threading
+from collections import namedtuple
+from concurrent.futures import Future
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+from smartexam.cache import LRUCache
+
+PreparedImage = namedtuple("PreparedImage", ["digest", "mime", "data", "width", "height", "detail"])
+
+
+def image_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def fit_size(width, height, max_side=2048, short_side=768):
+    """Largest size within ``max_side`` x ``max_side`` with the shorter side at most ``short_side``."""
+    scale = min(1.0, max_side / max(width, height), short_side / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def prepare_image(data, max_side=2048, short_side=768, quality=85, low_detail_side=512):
+    """Downscale and re-encode raw image bytes; returns a ``PreparedImage``.
+
+    Images that already fit ``low_detail_side`` are sent at low detail, since
+    high detail would not show the model anything more.
+    """
+    with Image.open(BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            # JPEG has no alpha channel, so put transparent parts on white
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        size = fit_size(image.width, image.height, max_side, short_side)
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+        buffered = BytesIO()
+        image.save(buffered, format="JPEG", quality=quality, optimize=True)
+    detail = "low" if max(size) <= low_detail_side else "high"
+    encoded = base64.b64encode(buffered.getvalue()).decode("ascii")
+    return PreparedImage(image_digest(data), "image/jpeg", encoded, size[0], size[1], detail)
+
+
+def data_url(image):
+    return f"data:{image.mime};base64,{image.data}"
+
+
+class ImagePreprocessor:
+    """Prepares images in ``executor`` and caches the results by content hash.
+
+    Identical uploads that arrive while the first one is still being
+    processed wait for the same future instead of starting a second job.
+    """
+
+    def __init__(self, executor, max_bytes=64 * 1024 * 1024, **options):
+        self.executor = executor
+        self.options = options
+        self._cache = LRUCache(max_bytes, sizeof=lambda image: len(image.data))
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, data):
+        """Return a future of the ``PreparedImage`` of ``data``."""
+        digest = image_digest(data)
+        with self._lock:
+            future = self._pending.get(digest)
+            if future is not None:
+                return future
+            cached = self._cache.get(digest)
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+                return future
+            future = self.executor.submit(prepare_image, data, **self.options)
+            self._pending[digest] = future
+        future.add_done_callback(lambda done: self._finish(digest, done))
+        return future
+
+    def _finish(self, digest, future):
+        with self._lock:
+            self._pending.pop(digest, None)
+            if future.exception() is None:
+                self._cache.put(digest, future.result())
+
+    def stats(self):
+        return {"hits": self._cache.hits, "misses": self._cache.misses, "bytes": self._cache.current_bytes}
+
+
+def make_thumbnail(image, side=512, quality=80):
+    """A low detail copy of a ``PreparedImage`` that fits ``side`` x ``side``."""
+    return prepare_image(base64.b64decode(image.data), max_side=side, short_side=side, quality=quality,
+                         low_detail_side=side)._replace(digest=image.digest)
+
+
+def make_openai_describer(client, model="gpt-4o-mini", max_tokens=300):
+    """Return a ``describe(image)`` callable that has the chat API describe a ``PreparedImage``."""
+    def describe(image):
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": [
+                {"type": "text", "text": "Describe this image so that questions about it can be answered "
+                                         "without seeing it. Transcribe any text, formulas and labels."},
+                {"type": "image_url", "image_url": {"url": data_url(image), "detail": image.detail}},
+            ]}],
+            temperature=0.2,
+            max_tokens=max_tokens,
+        )
+        return response.choices[0].message.content
+
+    return describe
+
+
+class SessionImageStore:
+    """The images of one chat session, kept once and referenced from messages by digest.
+
+    Messages hold ``{"type": "image_ref", "digest": ...}`` parts and ``expand``
+    turns them into API content. Images from the last ``recent_turns`` user
+    turns are sent as prepared. Older ones follow ``policy``:
+
+    - "low": a 512 px low detail thumbnail (85 tokens instead of 765)
+    - "describe": a text description, made once by ``describe(image)``
+    - "drop": a short placeholder
+    """
+
+    def __init__(self, policy="low", recent_turns=2, describe=None):
+        if policy == "describe" and describe is None:
+            raise ValueError("the describe policy needs a describe callable")
+        self.policy = policy
+        self.recent_turns = recent_turns
+        self.describe = describe
+        self.turn = 0
+        self.images = {}  # digest -> PreparedImage
+        self.added = {}  # digest -> turn it was added in
+        self.thumbnails = {}
+        self.descriptions = {}
+
+    def add(self, image):
+        """Store ``image``; returns its message part, or None if it is already in the session."""
+        if image.digest in self.images:
+            return None
+        self.images[image.digest] = image
+        self.added[image.digest] = self.turn
+        return {"type": "image_ref", "digest": image.digest}
+
+    def next_turn(self):
+        self.turn += 1
+
+    def url(self, digest):
+        return data_url(self.images[digest])
+
+    def _part(self, digest):
+        image = self.images[digest]
+        if self.turn - self.added[digest] < self.recent_turns:
+            return {"type": "image_url", "image_url": {"url": data_url(image), "detail": image.detail}}
+        if self.policy == "low":
+            if digest not in self.thumbnails:
+                self.thumbnails[digest] = make_thumbnail(image)
+            return {"type": "image_url", "image_url": {"url": data_url(self.thumbnails[digest]), "detail": "low"}}
+        if self.policy == "describe":
+            if digest not in self.descriptions:
+                self.descriptions[digest] = self.describe(image)
+            return {"type": "text", "text": f"[Earlier image, described: {self.descriptions[digest]}]"}
+        return {"type": "text", "text": "[An earlier image, no longer attached]"}
+
+    def expand(self, messages):
+        """API messages with every image reference replaced according to its age and the policy."""
+        expanded = []
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, list) and any(part.get("type") == "image_ref" for part in content):
+                content = [self._part(part["digest"]) if part.get("type") == "image_ref" else part
+                           for part in content]
+                message = {**message, "content": content}
+            expanded.append(message)
+        return expanded
+
+    def stats(self):
+        return {
+            "images": len(self.images),
+            "bytes": sum(len(image.data) for image in self.images.values()),
+            "thumbnails": len(self.thumbnails),
+            "descriptions": len(self.descriptions),
+        }
@@ -0,0 +1,218 @@
+"""Background jobs that outlive Streamlit script runs.
+
+Exam generation used to run inside the script run, so changing a widget
+half way through threw the work away or started it again. Jobs are instead
+run by a process-wide worker pool and recorded in a small SQLite table. A
+page only keeps the job id and polls it. Submitting the same work again
+(same key, e.g. document hash and settings) while it is still queued or
+running joins the existing job instead of starting a second one.
+
+While a job runs, its live object (e.g. an ``ExamStream``) can be read from
+the queue by any session of the process that runs it. Once it is done, its
+result is in the table.
+
+Several server processes can share the table. Every job records the process
+that owns it and that process keeps touching its active jobs. Active jobs
+of a process that is gone (it stopped touching them, or it was running on
+this host and has exited) are marked as failed, so nobody waits for them.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = ("queued", "running")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    error TEXT,
+    result TEXT,
+    owner TEXT
+)
+"""
+
+
+def _owner_running(owner):
+    """Whether the process ``owner`` ("host:pid:token") may still be running; only known for this host."""
+    host, _, rest = (owner or "").partition(":")
+    if host != socket.gethostname():
+        return bool(owner)  # Another host: only its heartbeat tells; jobs of old rows without an owner are gone
+    try:
+        os.kill(int(rest.partition(":")[0]), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        pass
+    return True
+
+
+class JobQueue:
+    """Runs jobs on ``workers`` threads and keeps their state in the SQLite database at ``path``.
+
+    Active jobs are touched every ``heartbeat`` seconds; those of another
+    process that were not touched for ``stale_after`` seconds count as
+    interrupted.
+    """
+
+    def __init__(self, path, workers=2, heartbeat=10.0, stale_after=60.0):
+        self.path = path
+        self.heartbeat = heartbeat
+        self.stale_after = stale_after
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._live = {}
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.execute(_SCHEMA)
+            if "owner" not in [column[1] for column in db.execute("PRAGMA table_info(jobs)")]:
+                db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")  # Tables of older versions
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status)")
+            self._fail_orphans(db)
+        threading.Thread(target=self._beat, name="job-heartbeat", daemon=True).start()
+
+    @contextmanager
+    def _connect(self, immediate=False):
+        # One connection per call, so every thread uses its own; commits on success
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                if immediate:
+                    # Take the write lock up front: a read followed by a write can otherwise deadlock with
+                    # another writer, which SQLite reports as "database is locked" without waiting
+                    db.execute("BEGIN IMMEDIATE")
+                yield db
+        finally:
+            db.close()
+
+    def _fail_orphans(self, db):
+        # Jobs of a process that is gone cannot finish any more
+        now = time.time()
+        rows = db.execute(
+            "SELECT id, owner, updated FROM jobs WHERE status IN (?, ?) AND owner IS NOT ?", (*ACTIVE, self.owner)
+        ).fetchall()
+        orphans = [(now, job_id) for job_id, owner, updated in rows
+                   if updated < now - self.stale_after or not _owner_running(owner)]
+        db.executemany("UPDATE jobs SET status = 'failed', error = 'interrupted', updated = ? WHERE id = ?", orphans)
+        return len(orphans)
+
+    def _beat(self):
+        while True:
+            time.sleep(self.heartbeat)
+            try:
+                with self._connect() as db:
+                    db.execute(
+                        "UPDATE jobs SET updated = ? WHERE owner = ? AND status IN (?, ?)",
+                        (time.time(), self.owner, *ACTIVE),
+                    )
+            except sqlite3.Error:
+                logger.exception("Could not touch the active jobs")
+
+    def submit(self, key, factory, join=True):
+        """Start a job for ``key`` and return its id, or the id of an active job with the same key.
+
+        ``factory()`` is only called for a new job. It returns ``(live, run)``:
+        ``live`` is shared through ``live(job_id)`` while the job runs and
+        ``run()`` does the work and returns a JSON-serializable result.
+        """
+        with self._lock:
+            with self._connect(immediate=True) as db:
+                if join:
+                    self._fail_orphans(db)  # Never join a job nobody is running
+                    row = db.execute(
+                        "SELECT id FROM jobs WHERE key = ? AND status IN (?, ?) ORDER BY created DESC LIMIT 1",
+                        (key, *ACTIVE),
+                    ).fetchone()
+                    if row is not None:
+                        return row[0]
+                job_id = uuid.uuid4().hex
+                now = time.time()
+                db.execute(
+                    "INSERT INTO jobs (id, key, status, created, updated, owner) VALUES (?, ?, 'queued', ?, ?, ?)",
+                    (job_id, key, now, now, self.owner),
+                )
+            try:
+                live, run = factory()
+            except Exception as e:
+                self._update(job_id, "failed", error=str(e) or type(e).__name__)
+                raise
+            self._live[job_id] = live
+        self._executor.submit(self._run, job_id, run)
+        return job_id
+
+    def _update(self, job_id, status, error=None, result=None):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, error = ?, result = ?, updated = ? WHERE id = ?",
+                (status, error, result, time.time(), job_id),
+            )
+
+    def _run(self, job_id, run):
+        with self._connect() as db:
+            # Not for a job that was failed while it was queued
+            db.execute("UPDATE jobs SET status = 'running', updated = ? WHERE id = ? AND status = 'queued'",
+                       (time.time(), job_id))
+        try:
+            result = run()
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            self._update(job_id, "failed", error=str(e) or type(e).__name__)
+        else:
+            self._update(job_id, "done", result=json.dumps(result))
+        finally:
+            with self._lock:
+                self._live.pop(job_id, None)
+
+    def fail(self, job_id, error):
+        """Mark an active job as failed, e.g. one that takes too long, so its key starts a new job.
+
+        A job that is still running here can finish anyway and then records its result.
+        """
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE id = ? AND status IN (?, ?)",
+                (error, time.time(), job_id, *ACTIVE),
+            )
+
+    def get(self, job_id):
+        """The job as a dict (``status``, ``error``, ``result``, ...), or None if it is unknown."""
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None and row["status"] in ACTIVE and row["owner"] != self.owner and self._fail_orphans(db):
+                row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def live(self, job_id):
+        """The live object of a job that is still queued or running in this process, or None.
+
+        Jobs of another process have no live object here; their result can be read with ``get`` once they are done.
+        """
+        with self._lock:
+            return self._live.get(job_id)
+
+    def stats(self):
+        with self._connect() as db:
+            counts = dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        counts["live"] = len(self._live)
+        return counts
@@ -0,0 +1,90 @@
+"""Incremental parsing of a JSON array that arrives in pieces.
+
+The model streams its questions as one JSON array. Waiting for the closing
+bracket means waiting for the whole response. The parser below instead
+tracks string and bracket state as text comes in, and returns every element
+of the top-level array as soon as that element is syntactically complete.
+"""
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JsonArrayParser:
+    """Feed text with ``feed``; get back the array elements completed by it.
+
+    Text before the opening ``[`` (e.g. a Markdown code fence) is skipped and
+    so is everything after the closing ``]``. Elements are expected to be
+    objects or arrays; one that does not parse is counted in ``errors`` and
+    skipped, and the rest of the array carries on.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self.errors = 0
+        self._element = []
+        self._depth = 0  # nesting inside the current element, 0 between elements
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text):
+        elements = []
+        if self.finished:
+            return elements
+        position = 0
+        if not self.started:
+            position = text.find("[")
+            if position < 0:
+                return elements
+            self.started = True
+            position += 1
+        for char in text[position:]:
+            if self._depth == 0:
+                if char in "{[":
+                    self._depth = 1
+                    self._element = [char]
+                elif char == "]":
+                    self.finished = True
+                    break
+                continue
+            self._element.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    element = self._parse("".join(self._element))
+                    if element is not None:
+                        elements.append(element)
+                    self._element = []
+        return elements
+
+    def _parse(self, text):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            self.errors += 1
+            logger.warning("Skipping an array element that is not valid JSON: %.80s", text)
+            return None
+
+
+def iter_json_array(pieces):
+    """Yield the elements of a JSON array streamed as ``pieces`` of text, as soon as each is complete.
+
+    All pieces are consumed, so a generator behind them runs to its end.
+    """
+    parser = JsonArrayParser()
+    for piece in pieces:
+        yield from parser.feed(piece)
@@ -0,0 +1,78 @@
+"""Cache of chat completion responses.
+
+Students often upload the same lecture, so identical summarize and question
+generation requests are answered from here instead of the API. Entries are
+keyed by model, normalized messages, temperature, max_tokens and response
+format, kept in a memory LRU with an optional disk tier, and expire after a
+TTL.
+"""
+
+import hashlib
+import json
+import threading
+
+from smartexam.cache import TieredCache
+
+
+def _normalize(value):
+    # Whitespace differences (e.g. from PDF extraction) should not change the key
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    return value
+
+
+def response_key(model, messages, temperature, max_tokens=None, response_format=None):
+    payload = {
+        "model": model,
+        "messages": _normalize(messages),
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    if response_format is not None:
+        payload["response_format"] = response_format
+    data = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Memory and disk cache of completion texts with hit rate and tokens saved."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, disk_dir=None, disk_max_bytes=None, ttl=7 * 24 * 3600):
+        self._cache = TieredCache(
+            max_bytes,
+            dumps=lambda entry: json.dumps(entry).encode("utf-8"),
+            loads=lambda data: json.loads(data.decode("utf-8")),
+            sizeof=lambda entry: len(entry["content"].encode("utf-8")),
+            disk_dir=disk_dir,
+            disk_max_bytes=disk_max_bytes,
+            suffix=".json",
+            ttl=ttl,
+        )
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached completion text for ``key``, or None."""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        with self._lock:
+            self.tokens_saved += entry["prompt_tokens"] + entry["completion_tokens"]
+        return entry["content"]
+
+    def put(self, key, content, usage=None):
+        """Store a completion; ``usage`` is the response's usage object, used for tokens saved."""
+        self._cache.put(key, {
+            "content": content,
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        })
+
+    def stats(self):
+        stats = self._cache.stats()
+        stats["tokens_saved"] = self.tokens_saved
+        return stats
@@ -0,0 +1,133 @@
+"""Token-budgeted conversation memory for the chat pages.
+
+The memory holds the API-ready transcript. Each message is converted and
+counted once when it is appended, instead of the whole history being
+rebuilt on every turn. When the transcript grows past its token budget, the
+oldest turns are folded into a running summary and only the most recent
+turns are kept verbatim, so request size stays flat however long the
+conversation gets.
+"""
+
+import logging
+from collections import deque
+
+from smartexam.tokenizer import get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+# Rough prompt cost of an image part, by detail level
+IMAGE_TOKENS = {"low": 85, "high": 765, "auto": 765}
+
+
+def message_text(message):
+    """Text of a message; image parts are shown as a placeholder."""
+    content = message["content"]
+    if isinstance(content, str):
+        return content
+    parts = []
+    for part in content:
+        if part.get("type") == "text":
+            parts.append(part["text"])
+        elif part.get("type") in ("image_url", "image_ref"):
+            parts.append("[image]")
+    return "\n".join(parts)
+
+
+def make_openai_summarizer(client, model="gpt-4o-mini", max_tokens=500):
+    """Return a ``summarize(summary, messages)`` callable that uses the chat API."""
+    def summarize(summary, messages):
+        transcript = "\n".join(f"{message['role']}: {message_text(message)}" for message in messages)
+        prompt = (
+            "Here is the summary of a conversation so far:\n\n"
+            f"{summary or '(empty)'}\n\n"
+            "Update it with the following messages. Keep facts, questions and answers that may be referred to "
+            "later, and keep it concise:\n\n" + transcript
+        )
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            max_tokens=max_tokens,
+        )
+        return response.choices[0].message.content
+
+    return summarize
+
+
+class ConversationMemory:
+    """API transcript of a chat, bounded by ``token_budget`` tokens.
+
+    System messages are always sent. Beyond them, the ``keep_recent`` most
+    recent messages are always kept verbatim; older ones are folded into a
+    running summary by ``summarize(summary, messages)`` once the budget is
+    exceeded. Without ``summarize`` the oldest messages are simply dropped.
+    """
+
+    def __init__(self, token_budget=4000, keep_recent=6, summarize=None, tokenizer=None):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.summarize = summarize
+        self.tokenizer = tokenizer or get_tokenizer()
+        self.system = []
+        self.summary = ""
+        self.turns = deque()  # (message, tokens)
+        self.tokens = 0
+
+    def count(self, message):
+        content = message["content"]
+        if isinstance(content, str):
+            return self.tokenizer.count(content) + 4
+        tokens = 4
+        for part in content:
+            if part.get("type") == "text":
+                tokens += self.tokenizer.count(part["text"])
+            elif part.get("type") == "image_url":
+                tokens += IMAGE_TOKENS.get(part["image_url"].get("detail", "auto"), IMAGE_TOKENS["auto"])
+            elif part.get("type") == "image_ref":
+                # Resolved by the session image store; count it at full cost to stay within budget
+                tokens += IMAGE_TOKENS["high"]
+        return tokens
+
+    def set_system(self, content):
+        self.system = [{"role": "system", "content": content}]
+
+    def append(self, message):
+        tokens = self.count(message)
+        self.turns.append((message, tokens))
+        self.tokens += tokens
+
+    def compact(self):
+        """Fold the oldest turns into the summary once the transcript is over budget.
+
+        Folding goes down to half the budget, so the summary is updated every
+        few turns with several messages at once rather than on every turn.
+        """
+        if self.tokens + self._summary_tokens() <= self.token_budget:
+            return
+        folded = []
+        while self.tokens + self._summary_tokens() > self.token_budget // 2 and len(self.turns) > self.keep_recent:
+            message, tokens = self.turns.popleft()
+            self.tokens -= tokens
+            folded.append(message)
+        if not folded or self.summarize is None:
+            return
+        try:
+            self.summary = self.summarize(self.summary, folded)
+        except Exception:
+            logger.exception("Could not summarize %d old messages; they are dropped", len(folded))
+
+    def _summary_tokens(self):
+        return self.tokenizer.count(self.summary) if self.summary else 0
+
+    def api_messages(self):
+        """The transcript to send: system messages, the running summary, then the recent turns."""
+        messages = list(self.system)
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        messages.extend(message for message, _ in self.turns)
+        return messages
+
+    def clear(self):
+        self.summary = ""
+        self.turns.clear()
+        self.tokens = 0
@@ -0,0 +1,228 @@
+"""PDF text extraction shared by all pages.
+
+Extracted page texts are cached under a SHA-256 hash of the uploaded bytes,
+so the same lecture is only parsed once per server no matter how many reruns
+or pages use it. Large documents are split into page ranges that are
+extracted in parallel by a pool of worker processes.
+"""
+
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import types
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from io import BytesIO
+
+from PyPDF2 import PdfReader
+
+from smartexam.cache import TieredCache
+
+logger = logging.getLogger(__name__)
+
+
+def read_pdf_bytes(pdf_file):
+    """Return the raw bytes of an uploaded file (or any binary file object)."""
+    if isinstance(pdf_file, (bytes, bytearray)):
+        return bytes(pdf_file)
+    if hasattr(pdf_file, "getvalue"):
+        return pdf_file.getvalue()
+    pdf_file.seek(0)
+    return pdf_file.read()
+
+
+def document_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def iter_pages(data):
+    """Yield the text of every page, in order. Pages without text give ""."""
+    pdf_reader = PdfReader(BytesIO(data))
+    for page in pdf_reader.pages:
+        yield page.extract_text() or ""
+
+
+def count_pages(data):
+    return len(PdfReader(BytesIO(data)).pages)
+
+
+def extract_pages(data):
+    return list(iter_pages(data))
+
+
+def _extract_page_range(path, start, stop):
+    # Runs in a worker process; every range reads the document from the same file
+    pdf_reader = PdfReader(path)
+    return [pdf_reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+_main_lock = threading.Lock()
+
+
+@contextmanager
+def _plain_main():
+    # Streamlit puts the running page in sys.modules["__main__"], and a new worker process runs
+    # the main module again before its first task. Workers are started while it is hidden.
+    with _main_lock:
+        main = sys.modules.get("__main__")
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = main
+
+
+def split_page_range(page_count, parts):
+    """Split ``range(page_count)`` into at most ``parts`` contiguous (start, stop) ranges."""
+    parts = max(1, min(parts, page_count))
+    size, extra = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for i in range(parts):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+class PdfExtractor:
+    """Extracts page texts, spreading large documents over worker processes.
+
+    Documents with fewer than ``min_parallel_pages`` pages (or ``workers=1``)
+    are extracted serially on the calling thread, where starting a task costs
+    more than it saves. The process pool is created on first use and kept for
+    the lifetime of the extractor. When a worker dies the pool is dropped and
+    the document is finished serially; the next one gets a new pool.
+    """
+
+    def __init__(self, workers=None, min_parallel_pages=16, ranges_per_worker=2):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_parallel_pages = min_parallel_pages
+        self.ranges_per_worker = ranges_per_worker
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Not "fork": forking the multi-threaded Streamlit server is unsafe. The fork server
+                # starts clean and has this module loaded already, so workers start fast.
+                if "forkserver" in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context("forkserver")
+                    context.set_forkserver_preload(["smartexam.pdf_text"])
+                else:
+                    context = multiprocessing.get_context("spawn")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._pool
+
+    def _drop_pool(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def is_parallel(self, page_count):
+        """Whether a document of ``page_count`` pages is spread over the worker processes."""
+        return self.workers > 1 and page_count >= self.min_parallel_pages
+
+    def iter_pages(self, data):
+        """Yield page texts in order, as soon as the range holding them is done."""
+        page_count = count_pages(data)
+        if not self.is_parallel(page_count):
+            yield from iter_pages(data)
+            return
+        ranges = split_page_range(page_count, self.workers * self.ranges_per_worker)
+        # Written once for all workers, instead of pickling the whole document into every range
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as f:
+            f.write(data)
+            f.flush()
+            pool = self._get_pool()
+            futures = []
+            done = 0
+            try:
+                with _plain_main():  # Worker processes are started on submit
+                    futures = [pool.submit(_extract_page_range, f.name, start, stop) for start, stop in ranges]
+                for future in futures:
+                    pages = future.result()
+                    yield from pages
+                    done += len(pages)
+            except BrokenProcessPool:
+                logger.warning("A PDF worker process died; extracting the rest of the document serially")
+                self._drop_pool(pool)
+                yield from itertools.islice(iter_pages(data), done, None)
+            finally:
+                # The consumer may stop early; don't keep the pool busy for nothing
+                for future in futures:
+                    future.cancel()
+
+    def extract_pages(self, data):
+        return list(self.iter_pages(data))
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+def join_pages(pages):
+    return "\n".join(pages)
+
+
+def _pages_size(pages):
+    return sum(len(page.encode("utf-8")) for page in pages)
+
+
+class PdfTextCache:
+    """Content-addressed cache of extracted page texts.
+
+    ``max_bytes`` bounds the in-process LRU; ``disk_dir`` enables a second tier
+    that survives restarts and is shared by every worker on the machine.
+    ``extractor`` is called with the raw bytes on a miss and must yield the
+    page texts in order.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None, disk_max_bytes=None, extractor=iter_pages):
+        self.extractor = extractor
+        self._cache = TieredCache(
+            max_bytes,
+            dumps=lambda pages: json.dumps(pages).encode("utf-8"),
+            loads=lambda data: json.loads(data.decode("utf-8")),
+            sizeof=_pages_size,
+            disk_dir=disk_dir,
+            disk_max_bytes=disk_max_bytes,
+            suffix=".json",
+        )
+
+    def iter_pages(self, data, doc_hash=None):
+        """Yield the page texts of ``data``, extracting them on a miss.
+
+        On a miss the pages are yielded while extraction is still running and
+        only stored once the whole document has been read.
+        """
+        doc_hash = doc_hash or document_hash(data)
+        pages = self._cache.get(doc_hash)
+        if pages is not None:
+            yield from pages
+            return
+        pages = []
+        for page in self.extractor(data):
+            pages.append(page)
+            yield page
+        self._cache.put(doc_hash, pages)
+
+    def get_pages(self, data, doc_hash=None):
+        return list(self.iter_pages(data, doc_hash))
+
+    def get_text(self, data, doc_hash=None):
+        return join_pages(self.get_pages(data, doc_hash))
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,239 @@
+"""Streaming exam generation pipeline.
+
+Pages come out of extraction one at a time and flow (optionally through the
+summarizer) into the chunker. Every finished chunk is handed to a background
+executor straight away, so parsing the rest of the document overlaps with
+the model calls and the first questions come back before the last page has
+been read. ``ExamStream`` runs the same pipeline on a job worker (see
+``smartexam.jobs``) and publishes single questions, so the quiz can start
+with the first one.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from smartexam.chunking import TokenChunker
+
+logger = logging.getLogger(__name__)
+
+
+def stream_ordered(units, work, executor, max_pending=None):
+    """Run ``work`` on every unit in ``executor`` and yield the results in unit order.
+
+    Units are pulled lazily. Results that are already finished are yielded
+    between two units, so the consumer sees the first result before the
+    input is exhausted. With ``max_pending`` no more than that many units
+    are submitted ahead of the consumer.
+    """
+    pending = deque()
+    for unit in units:
+        if max_pending is not None and len(pending) >= max_pending:
+            yield pending.popleft().result()
+        pending.append(executor.submit(work, unit))
+        while pending and pending[0].done():
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def call_with_retries(fn, arg, retries=2, backoff=1.0):
+    """Call ``fn(arg)``, retrying it up to ``retries`` times with exponential backoff."""
+    for attempt in range(retries + 1):
+        try:
+            return fn(arg)
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def stream_exam_responses(pages, generate, condense=None, chunker=None, executor=None,
+                          max_in_flight=4, retries=2, backoff=1.0, indexed=False, budget=None, retry_kwargs=None):
+    """Yield one ``generate`` result per chunk of a streamed document, in document order.
+
+    ``condense`` optionally turns the stream of pages into a stream of
+    shorter texts (see ``MapReduceSummarizer.iter_summaries``). The texts are
+    packed into chunks by ``chunker`` (a ``TokenChunker`` with the default
+    budget when not given) and every chunk is sent to ``generate``.
+
+    Up to ``max_in_flight`` chunks are generated at the same time. A call that
+    raises is retried on its own; when it still fails, ``None`` is yielded in
+    its place and the rest of the document carries on. Retries also get the
+    keyword arguments in ``retry_kwargs`` (e.g. ``{"use_cache": False}``).
+
+    With ``indexed`` the chunk number is passed along: ``generate(index, chunk)``.
+    With a ``QuestionBudget`` every chunk also gets its share of the exam as
+    ``generate(..., questions=n)``.
+    """
+    chunker = chunker or TokenChunker()
+    if budget is not None:
+        pages = budget.track_pages(pages)
+    texts = condense(pages) if condense is not None else pages
+    if budget is not None:
+        texts = budget.track_texts(texts)
+
+    def call(unit, **kwargs):
+        index, chunk, questions = unit
+        args = (index, chunk) if indexed else (chunk,)
+        if budget is not None:
+            kwargs["questions"] = questions
+        return generate(*args, **kwargs)
+
+    def work(unit):
+        attempts = []
+
+        def attempt(unit):
+            retry = bool(attempts)
+            attempts.append(unit)
+            return call(unit, **(retry_kwargs or {})) if retry else call(unit)
+
+        try:
+            return call_with_retries(attempt, unit, retries, backoff)
+        except Exception:
+            logger.exception("Giving up on a chunk after %d retries", retries)
+            return None
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max_in_flight)
+    try:
+        # Shares are handed out here, in document order, as the chunks are produced
+        units = (
+            (index, chunk, budget.allocate(chunk, overlap_chars) if budget is not None else None)
+            for index, (chunk, overlap_chars) in enumerate(chunker.iter_chunks_with_overlap(texts))
+        )
+        yield from stream_ordered(units, work, executor, max_pending=max_in_flight)
+    finally:
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
+
+
+class OrderedFeed:
+    """Items produced by numbered units in parallel, published in unit order.
+
+    Items of the first unfinished unit show up in ``items`` as soon as they
+    are added. Items of later units wait until every unit before them is
+    finished. ``items`` only ever grows, so readers can hold on to it.
+
+    ``accept(item)`` is called on every item at the moment it would be
+    published, in publication order; items it returns False for are dropped.
+    """
+
+    def __init__(self, accept=None):
+        self.items = []
+        self.accept = accept
+        self.closed = False
+        self._buffered = {}
+        self._counts = {}
+        self._finished = set()
+        self._head = 0
+        self._condition = threading.Condition()
+
+    def add(self, index, item):
+        with self._condition:
+            self._counts[index] = self._counts.get(index, 0) + 1
+            if index == self._head:
+                self._publish([item])
+                self._condition.notify_all()
+            else:
+                self._buffered.setdefault(index, []).append(item)
+
+    def count(self, index):
+        """Number of items added for unit ``index`` so far."""
+        with self._condition:
+            return self._counts.get(index, 0)
+
+    def finish(self, index):
+        with self._condition:
+            self._finished.add(index)
+            while self._head in self._finished:
+                self._head += 1
+                self._publish(self._buffered.pop(self._head, []))
+            self._condition.notify_all()
+
+    def close(self):
+        """Publish whatever is still buffered and mark the feed as complete."""
+        with self._condition:
+            for index in sorted(self._buffered):
+                self._publish(self._buffered.pop(index))
+            self.closed = True
+            self._condition.notify_all()
+
+    def _publish(self, items):
+        if self.accept is not None:
+            items = [item for item in items if self.accept(item)]
+        self.items.extend(items)
+
+    def wait(self, count, timeout=None):
+        """Wait until there are more than ``count`` items or the feed is closed; returns the item count."""
+        with self._condition:
+            self._condition.wait_for(lambda: len(self.items) > count or self.closed, timeout)
+            return len(self.items)
+
+
+class ExamStream:
+    """Runs ``stream_exam_responses`` when ``run`` is called, publishing results through an ``OrderedFeed``.
+
+    ``generate(index, chunk, feed)`` adds the items of one chunk to ``feed``
+    while they are produced and returns their number. With a ``budget`` it
+    also gets ``questions=n``. ``accept`` filters the items as they are
+    published (see ``OrderedFeed``) and ``retry_kwargs`` is passed on to
+    ``stream_exam_responses``. The stream owns ``executor`` and shuts it
+    down when the document is done. ``run`` blocks, so it is called on a
+    background job worker and other sessions read ``feed`` meanwhile.
+    """
+
+    def __init__(self, pages, generate, executor, condense=None, chunker=None, max_in_flight=4,
+                 retries=2, backoff=1.0, budget=None, accept=None, retry_kwargs=None):
+        self.feed = OrderedFeed(accept)
+        self.pages = []
+        self.chunks_done = 0
+        self.failed_chunks = 0
+        self.error = None
+        self._args = (pages, generate, executor, condense, chunker, max_in_flight, retries, backoff, budget,
+                      retry_kwargs)
+
+    def run(self):
+        """Run the stream on the calling thread and return the published items."""
+        self._run(*self._args)
+        return self.feed.items
+
+    @property
+    def done(self):
+        return self.feed.closed
+
+    def _run(self, pages, generate, executor, condense, chunker, max_in_flight, retries, backoff, budget,
+             retry_kwargs):
+        def read_pages():
+            for page in pages:
+                self.pages.append(page)
+                yield page
+
+        try:
+            results = stream_exam_responses(
+                read_pages(),
+                lambda index, chunk, **kwargs: generate(index, chunk, self.feed, **kwargs),
+                condense=condense,
+                chunker=chunker,
+                executor=executor,
+                max_in_flight=max_in_flight,
+                retries=retries,
+                backoff=backoff,
+                indexed=True,
+                budget=budget,
+                retry_kwargs=retry_kwargs,
+            )
+            for index, result in enumerate(results):
+                if result is None:
+                    self.failed_chunks += 1
+                self.feed.finish(index)
+                self.chunks_done = index + 1
+        except Exception as e:
+            logger.exception("Exam generation stopped")
+            self.error = e
+        finally:
+            self.feed.close()
+            executor.shutdown(cancel_futures=True)
@@ -0,0 +1,91 @@
+"""Exam questions: the structured output schema and validated question records.
+
+The model answers with a JSON object that follows ``QUESTION_SCHEMA``
+through the API's structured outputs, so the response is always valid JSON.
+Keys are kept short and the correct answer is the index of a choice rather
+than a copy of its text, which saves output tokens on every question. Each
+question is checked and turned into a ``Question`` before the app uses it.
+"""
+
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+QUESTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "q": {"type": "string", "description": "The question"},
+                    "c": {"type": "array", "items": {"type": "string"},
+                          "description": "Answer choices, without letters or numbers in front"},
+                    "a": {"type": "integer", "description": "Index of the correct choice, starting at 0"},
+                    "e": {"type": "string", "description": "Short explanation of the correct answer"},
+                },
+                "required": ["q", "c", "a", "e"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["questions"],
+    "additionalProperties": False,
+}
+
+QUESTION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "exam", "strict": True, "schema": QUESTION_SCHEMA},
+}
+
+
+class Question(namedtuple("Question", ["question", "choices", "answer", "explanation"])):
+    """One multiple choice question; ``answer`` is the index of the correct choice."""
+
+    __slots__ = ()
+
+    @property
+    def correct_answer(self):
+        return self.choices[self.answer]
+
+    def to_dict(self):
+        return {"q": self.question, "c": list(self.choices), "a": self.answer, "e": self.explanation}
+
+
+def choice_label(index):
+    return f"{chr(ord('A') + index)})"
+
+
+def parse_question(data, min_choices=2, max_choices=6):
+    """Turn one object of the schema into a ``Question``; raises ValueError if it is not usable."""
+    if not isinstance(data, dict):
+        raise ValueError("a question must be an object")
+    question = data.get("q")
+    choices = data.get("c")
+    answer = data.get("a")
+    explanation = data.get("e") or ""
+    if not isinstance(question, str) or not question.strip():
+        raise ValueError("the question text is missing")
+    if not isinstance(choices, list) or not all(isinstance(choice, str) and choice.strip() for choice in choices):
+        raise ValueError("the choices must be non-empty strings")
+    choices = tuple(choice.strip() for choice in choices)
+    if not min_choices <= len(choices) <= max_choices or len(set(choices)) != len(choices):
+        raise ValueError(f"expected {min_choices} to {max_choices} different choices, got {len(choices)}")
+    if isinstance(answer, bool) or not isinstance(answer, int) or not 0 <= answer < len(choices):
+        raise ValueError(f"the answer index {answer!r} is not one of the choices")
+    if not isinstance(explanation, str):
+        raise ValueError("the explanation must be a string")
+    return Question(question.strip(), choices, answer, explanation.strip())
+
+
+def parse_questions(items):
+    """Validate a list of question objects, skipping (and logging) the ones that are not usable."""
+    questions = []
+    for data in items:
+        try:
+            questions.append(parse_question(data))
+        except ValueError as e:
+            logger.warning("Skipping an invalid question: %s", e)
+    return questions
@@ -0,0 +1,267 @@
+"""Process-wide resources shared by every page and session.
+
+Everything here is created once per server process through
+``st.cache_resource`` and then reused across reruns, sessions and pages.
+Sizes and locations can be tuned through environment variables or
+Streamlit secrets.
+"""
+
+import atexit
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from smartexam.auth import SessionCache, make_supabase_verifier
+from smartexam.clients import OpenAIClientPool, api_key_id
+from smartexam.embeddings import DenseIndexStore, HashingEmbedder, OpenAIEmbedder
+from smartexam.exam_store import SqliteExamStore, SupabaseExamStore
+from smartexam.export import DEFAULT_FONT, ExamPdfExporter
+from smartexam.images import ImagePreprocessor
+from smartexam.jobs import JobQueue
+from smartexam.llm_cache import ResponseCache
+from smartexam.pdf_text import PdfExtractor, PdfTextCache
+from smartexam.retrieval import BM25Index
+from smartexam.usage import UsageMeter, UserDataCache, make_supabase_counter_sender, make_supabase_user_data_fetcher
+
+
+def setting(name, default=None):
+    """Read a setting from the environment first, then from Streamlit secrets."""
+    value = os.getenv(name)
+    if value is not None:
+        return value
+    try:
+        return st.secrets.get(name, default)
+    except FileNotFoundError:
+        return default
+
+
+def data_path(name):
+    """A file in the app's data directory, which is kept across restarts unlike the temp dir."""
+    directory = setting("SMARTEXAM_DATA_DIR") or os.path.join(os.path.expanduser("~"), ".smartexam")
+    return os.path.join(directory, name)
+
+
+@st.cache_resource
+def get_pdf_extractor():
+    workers = setting("PDF_EXTRACT_WORKERS")
+    return PdfExtractor(
+        workers=int(workers) if workers else None,
+        min_parallel_pages=int(setting("PDF_PARALLEL_MIN_PAGES", 16)),
+    )
+
+
+@st.cache_resource
+def get_pdf_text_cache():
+    disk_max_bytes = setting("PDF_CACHE_DISK_MAX_BYTES")
+    return PdfTextCache(
+        max_bytes=int(setting("PDF_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+        disk_dir=setting("PDF_CACHE_DIR"),
+        disk_max_bytes=int(disk_max_bytes) if disk_max_bytes else None,
+        extractor=get_pdf_extractor().iter_pages,
+    )
+
+
+@st.cache_resource
+def get_llm_response_cache():
+    disk_max_bytes = setting("LLM_CACHE_DISK_MAX_BYTES")
+    return ResponseCache(
+        max_bytes=int(setting("LLM_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+        disk_dir=setting("LLM_CACHE_DIR"),
+        disk_max_bytes=int(disk_max_bytes) if disk_max_bytes else None,
+        ttl=int(setting("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+    )
+
+
+@st.cache_resource
+def get_openai_client_pool():
+    return OpenAIClientPool(
+        max_connections=int(setting("OPENAI_MAX_CONNECTIONS", 20)),
+        max_keepalive_connections=int(setting("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 10)),
+        keepalive_expiry=float(setting("OPENAI_KEEPALIVE_SECONDS", 60)),
+        timeout=float(setting("OPENAI_TIMEOUT_SECONDS", 120)),
+        connect_timeout=float(setting("OPENAI_CONNECT_TIMEOUT_SECONDS", 10)),
+        http2=str(setting("OPENAI_HTTP2", "false")).lower() in ("1", "true", "yes"),
+        max_clients=int(setting("OPENAI_MAX_CLIENTS", 64)),
+    )
+
+
+@st.cache_resource
+def get_supabase_client():
+    """The one Supabase client of the process; its HTTP connections are reused by every page and session."""
+    from supabase import create_client
+
+    return create_client(setting("SUPABASE_URL"), setting("SUPABASE_KEY"))
+
+
+@st.cache_resource
+def get_session_cache():
+    return SessionCache(
+        make_supabase_verifier(get_supabase_client()),
+        leeway=float(setting("AUTH_SESSION_LEEWAY_SECONDS", 30)),
+        jwt_secret=setting("SUPABASE_JWT_SECRET"),
+    )
+
+
+def verified_session(session):
+    """The login session if its access token is valid, otherwise None; Supabase is only asked near the expiry."""
+    return get_session_cache().check(session)
+
+
+def get_openai_client(api_key):
+    """The shared client for ``api_key``; connections are reused across calls, reruns and sessions."""
+    return get_openai_client_pool().get(api_key)
+
+
+def get_dense_index_store(api_key=None):
+    """Dense indexes whose embeddings are paid with ``api_key``, the key the chat itself uses."""
+    return _get_dense_index_store(api_key_id(api_key), api_key)
+
+
+@st.cache_resource(max_entries=32)
+def _get_dense_index_store(key_id, _api_key):
+    # Cached by the hash of the key; Streamlit does not hash arguments starting with "_"
+    if setting("PDF_CHAT_EMBEDDER", "openai") == "hashing":
+        embedder = HashingEmbedder()
+    else:
+        embedder = OpenAIEmbedder(
+            lambda: get_openai_client(_api_key),  # From the pool on every call, it may have closed an older client
+            model=setting("PDF_CHAT_EMBEDDING_MODEL", "text-embedding-3-small"),
+        )
+    directory = setting("PDF_INDEX_DIR") or os.path.join(tempfile.gettempdir(), "smartexam-index")
+    return DenseIndexStore(directory, embedder)
+
+
+def get_pdf_index(doc_hash, pages, backend="bm25", api_key=None):
+    """Search index of a document, built once per document hash.
+
+    ``backend`` is "bm25" for the local keyword index or "dense" for the embedding index, which
+    embeds the document and the questions with ``api_key``.
+    """
+    return _get_pdf_index(doc_hash, pages, backend, api_key_id(api_key), api_key)
+
+
+@st.cache_resource(max_entries=32)
+def _get_pdf_index(doc_hash, _pages, backend, key_id, _api_key):
+    if backend == "dense":
+        return get_dense_index_store(_api_key).load_or_build(doc_hash, _pages)
+    return BM25Index.from_pages(_pages)
+
+
+@st.cache_resource
+def get_image_preprocessor():
+    """Image preprocessing shared by all sessions, with a bounded number of PIL workers."""
+    return ImagePreprocessor(
+        ThreadPoolExecutor(max_workers=int(setting("IMAGE_WORKERS", 2)), thread_name_prefix="images"),
+        max_bytes=int(setting("IMAGE_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+        max_side=int(setting("IMAGE_MAX_SIDE", 2048)),
+        short_side=int(setting("IMAGE_SHORT_SIDE", 768)),
+        quality=int(setting("IMAGE_JPEG_QUALITY", 85)),
+    )
+
+
+@st.cache_resource
+def get_exam_jobs():
+    """Exam generation jobs, run in the background so they survive reruns and are shared by sessions."""
+    path = setting("EXAM_JOB_DB") or os.path.join(tempfile.gettempdir(), "smartexam-jobs.sqlite3")
+    return JobQueue(path, workers=int(setting("EXAM_JOB_WORKERS", 2)))
+
+
+@st.cache_resource
+def get_exam_store():
+    """Stored exams: a local SQLite file by default, or the Supabase ``exams`` table."""
+    if setting("EXAM_STORE", "sqlite") == "supabase":
+        return SupabaseExamStore(get_supabase_client(), table=setting("EXAM_STORE_TABLE", "exams"))
+    path = setting("EXAM_STORE_DB") or os.path.join(tempfile.gettempdir(), "smartexam-exams.sqlite3")
+    return SqliteExamStore(path)
+
+
+@st.cache_resource
+def get_user_data_cache():
+    return UserDataCache(
+        make_supabase_user_data_fetcher(get_supabase_client()),
+        ttl=float(setting("USER_DATA_TTL_SECONDS", 30)),
+    )
+
+
+def fetch_user_data(user_id):
+    """The user's ``user_data`` row (or None), shared by reruns and pages for a few seconds.
+
+    The queries made and avoided are counted per session in ``st.session_state.user_data_queries``.
+    """
+    row, cached = get_user_data_cache().get(user_id)
+    counts = st.session_state.setdefault("user_data_queries", {"queries": 0, "avoided": 0})
+    counts["avoided" if cached else "queries"] += 1
+    pending = get_usage_meter().pending(user_id)
+    if row and pending:
+        # Increments still waiting in the usage meter count as well
+        row = dict(row)
+        for counter, amount in pending.items():
+            row[counter] = (row.get(counter) or 0) + amount
+    return row
+
+
+def invalidate_user_data(user_id):
+    """Drop the cached row after a usage counter of the user changed."""
+    get_user_data_cache().invalidate(user_id)
+
+
+def cache_stats_enabled():
+    return str(setting("SHOW_CACHE_STATS", "false")).lower() in ("1", "true", "yes")
+
+
+def show_user_data_stats():
+    if cache_stats_enabled():
+        counts = st.session_state.get("user_data_queries", {"queries": 0, "avoided": 0})
+        st.sidebar.caption(f"Account lookups this session: {counts['queries']} queried, {counts['avoided']} from cache")
+
+
+def show_llm_cache_stats():
+    if cache_stats_enabled():
+        stats = get_llm_response_cache().stats()
+        st.sidebar.caption(f"Model responses: {stats['hits']} from cache ({stats['hit_rate']:.0%}), "
+                           f"{stats['tokens_saved']:,} tokens saved")
+
+
+def show_pdf_cache_stats():
+    if cache_stats_enabled():
+        stats = get_pdf_text_cache().stats()
+        st.sidebar.caption(f"Parsed PDFs: {stats['hits']} from cache, {stats['misses']} parsed "
+                           f"({stats['hit_rate']:.0%} hit rate)")
+
+
+def show_openai_pool_stats():
+    if cache_stats_enabled():
+        stats = get_openai_client_pool().stats()
+        st.sidebar.caption(f"OpenAI requests: {stats['requests']} on {stats['connections_opened']} connections "
+                           f"({stats['reuse_rate']:.0%} reused)")
+
+
+@st.cache_resource
+def get_usage_meter():
+    """Usage counter increments, sent to Supabase in the background in batches."""
+    meter = UsageMeter(
+        make_supabase_counter_sender(get_supabase_client()),
+        journal=setting("USAGE_JOURNAL") or data_path("usage.jsonl"),
+        max_pending=int(setting("USAGE_FLUSH_SIZE", 20)),
+        flush_interval=float(setting("USAGE_FLUSH_SECONDS", 5)),
+        on_flush=invalidate_user_data,
+    )
+    atexit.register(meter.close)  # Send what is left when the server stops
+    return meter
+
+
+def record_usage(user_id, counter):
+    """Count one use of a feature (e.g. "mc_upload_count") without waiting for the database."""
+    get_usage_meter().record(user_id, counter)
+
+
+@st.cache_resource
+def get_pdf_exporter():
+    """Exam PDFs, with the font read once per process and finished documents cached by content."""
+    return ExamPdfExporter(
+        font_path=setting("PDF_EXPORT_FONT", DEFAULT_FONT),
+        bold_font_path=setting("PDF_EXPORT_BOLD_FONT"),
+        max_bytes=int(setting("PDF_EXPORT_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+    )
@@ -0,0 +1,88 @@
+"""Local BM25 retrieval over the pages of a document.
+
+Chat with PDF used to send the whole document with every question. Instead,
+the document is split into passages once, indexed in an in-memory inverted
+index, and only the best matching passages (with their page numbers) go
+into the prompt. Everything runs offline.
+"""
+
+import heapq
+import math
+import re
+from collections import Counter, namedtuple
+
+Passage = namedtuple("Passage", ["page", "text"])
+
+_TERM_RE = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with "
+    "what how why when who does do can you your i me my we our about".split()
+)
+
+
+def tokenize(text):
+    return [term for term in _TERM_RE.findall(text.lower()) if term not in STOPWORDS]
+
+
+def split_passages(pages, max_words=150, overlap_words=30):
+    """Split page texts into overlapping word windows. Page numbers start at 1."""
+    step = max(1, max_words - overlap_words)
+    passages = []
+    for number, page in enumerate(pages, start=1):
+        words = page.split()
+        for start in range(0, max(len(words) - overlap_words, 1), step):
+            window = words[start:start + max_words]
+            if window:
+                passages.append(Passage(number, " ".join(window)))
+    return passages
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring."""
+
+    def __init__(self, passages, k1=1.5, b=0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> list of (passage id, term frequency)
+        self.lengths = []
+        for passage_id, passage in enumerate(passages):
+            terms = tokenize(passage.text)
+            self.lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                self.postings.setdefault(term, []).append((passage_id, frequency))
+        count = len(passages)
+        self.average_length = sum(self.lengths) / count if count else 0.0
+        self.idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+        # Length normalization only depends on the passage, so compute it once
+        self._norms = [
+            k1 * (1 - b + b * length / self.average_length) if self.average_length else k1
+            for length in self.lengths
+        ]
+
+    @classmethod
+    def from_pages(cls, pages, max_words=150, overlap_words=30):
+        return cls(split_passages(pages, max_words, overlap_words))
+
+    def search(self, query, top_k=5):
+        """Return up to ``top_k`` (score, passage) pairs, best first."""
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for passage_id, frequency in postings:
+                score = idf * frequency * (self.k1 + 1) / (frequency + self._norms[passage_id])
+                scores[passage_id] = scores.get(passage_id, 0.0) + score
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(score, self.passages[passage_id]) for passage_id, score in best]
+
+
+def format_passages(results):
+    """Render search results for a prompt, in page order, each tagged with its page."""
+    passages = sorted((passage for _, passage in results), key=lambda passage: passage.page)
+    return "\n\n".join(f"[Page {passage.page}] {passage.text}" for passage in passages)
@@ -0,0 +1,101 @@
+"""Hierarchical (map-reduce) summarization of long lectures.
+
+Instead of one call with the whole document in the prompt, the lecture is
+split into sections that are summarized concurrently, and the partial
+summaries are merged a few at a time. Every level of the tree is a lazy,
+ordered stream, so the first merged summaries are ready while later pages
+are still being read.
+"""
+
+import logging
+from itertools import islice
+
+from smartexam.pipeline import call_with_retries, stream_ordered
+
+logger = logging.getLogger(__name__)
+
+
+def iter_sections(pages, section_chars=12000):
+    """Group consecutive pages into sections of at least ``section_chars`` characters."""
+    section = []
+    size = 0
+    for page in pages:
+        section.append(page)
+        size += len(page) + 1
+        if size >= section_chars:
+            yield "\n".join(section)
+            section = []
+            size = 0
+    if section:
+        yield "\n".join(section)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class MapReduceSummarizer:
+    """Condenses a stream of pages with a tree of summarize and merge calls.
+
+    Map: pages are grouped into sections of ``section_chars`` characters and
+    every section longer than ``min_chars`` goes through ``summarize(text)``.
+    Reduce: ``fan_in`` consecutive partial summaries at a time go through
+    ``merge(summaries)``, level by level, for at most ``max_depth`` levels in
+    total (1 means map only). Each level keeps at most ``max_fan_out`` calls
+    queued on ``executor``.
+
+    A call that keeps failing after its retries is replaced by its input
+    text, so no part of the lecture is dropped.
+
+    ``covered_chars`` counts the page characters that the summaries yielded
+    so far stand for.
+    """
+
+    def __init__(self, summarize, merge, executor, section_chars=12000, min_chars=3000,
+                 fan_in=4, max_depth=2, max_fan_out=4, retries=2, backoff=1.0):
+        self.summarize = summarize
+        self.merge = merge
+        self.executor = executor
+        self.section_chars = section_chars
+        self.min_chars = min_chars
+        self.fan_in = max(2, fan_in)
+        self.max_depth = max(1, max_depth)
+        self.max_fan_out = max_fan_out
+        self.retries = retries
+        self.backoff = backoff
+        self.covered_chars = 0
+
+    def _call(self, fn, arg, fallback):
+        try:
+            return call_with_retries(fn, arg, self.retries, self.backoff)
+        except Exception:
+            logger.exception("Summarization failed, keeping the text unsummarized")
+            return fallback
+
+    # Both steps return (text, size of the pages it stands for)
+
+    def _summarize_section(self, section):
+        if len(section) <= self.min_chars:
+            return section, len(section) + 1
+        return self._call(self.summarize, section, section), len(section) + 1
+
+    def _merge_group(self, group):
+        summaries = [summary for summary, _ in group]
+        size = sum(size for _, size in group)
+        combined = "\n\n".join(summaries)
+        if len(summaries) == 1 or len(combined) <= self.min_chars:
+            return combined, size
+        return self._call(self.merge, summaries, combined), size
+
+    def iter_summaries(self, pages):
+        """Yield the top-level summaries of ``pages`` in document order."""
+        level = stream_ordered(
+            iter_sections(pages, self.section_chars), self._summarize_section, self.executor, self.max_fan_out
+        )
+        for _ in range(self.max_depth - 1):
+            level = stream_ordered(batched(level, self.fan_in), self._merge_group, self.executor, self.max_fan_out)
+        for summary, size in level:
+            self.covered_chars += size
+            yield summary
@@ -0,0 +1,51 @@
+"""Local token counting.
+
+Token counts are used to size chunks and prompts without a network call.
+``tiktoken`` is used when it is installed and its encoding is available;
+otherwise a regex approximation of OpenAI's BPE is used, which is close
+enough for budgeting. Any object with a ``count(text)`` method can be
+passed wherever a tokenizer is expected.
+"""
+
+import functools
+import re
+
+try:
+    import tiktoken
+except ImportError:  # Optional dependency
+    tiktoken = None
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class RegexTokenizer:
+    """Approximates BPE: short words and punctuation marks are one token, long words one per six characters."""
+
+    name = "regex"
+
+    def count(self, text):
+        return sum(1 + (len(word) - 1) // 6 for word in _WORD_RE.findall(text))
+
+
+class TiktokenTokenizer:
+    def __init__(self, model="gpt-4o"):
+        try:
+            self._encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self._encoding = tiktoken.get_encoding("o200k_base")
+        self.name = self._encoding.name
+
+    def count(self, text):
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+@functools.lru_cache(maxsize=None)
+def get_tokenizer(model="gpt-4o"):
+    """Return the best local tokenizer for ``model``, shared per process."""
+    if tiktoken is not None:
+        try:
+            return TiktokenTokenizer(model)
+        except Exception:
+            # tiktoken downloads its encodings on first use, which fails offline
+            pass
+    return RegexTokenizer()
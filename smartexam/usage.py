@@ -0,0 +1,256 @@
+"""Subscription tier and usage counters of the signed-in user.
+
+Every page reads the user's ``user_data`` row on every rerun, and a quiz
+reruns on each click. ``UserDataCache`` keeps the row for a short TTL, so
+only the first rerun pays the round-trip. All counters are read in the
+same query, so one cached row serves every page. Whoever changes a counter
+calls ``invalidate`` once the change is committed and the next read gets
+the new value.
+
+Increments go through ``UsageMeter``, which takes the RPCs off the request
+path and sends them in batches from a background thread. All increments of
+one counter of a user are sent as a single call of this function::
+
+    create or replace function increment_usage(user_uuid uuid, counter text, amount integer)
+    returns void language plpgsql as $$
+    begin
+        if counter not in ('mc_upload_count', 'graph_upload_count', 'pdf_upload_count', 'img_upload_count') then
+            raise exception 'unknown usage counter %', counter;
+        end if;
+        execute format('update user_data set %I = coalesce(%I, 0) + $1 where id = $2', counter, counter)
+            using amount, user_uuid;
+    end;
+    $$;
+"""
+
+import itertools
+import json
+import logging
+import os
+import threading
+from collections import Counter
+
+try:
+    import fcntl
+except ImportError:  # Windows: journals are not locked
+    fcntl = None
+
+from smartexam.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+USER_DATA_COLUMNS = ("subscription_tier", "mc_upload_count", "graph_upload_count",
+                     "pdf_upload_count", "img_upload_count")
+
+
+def make_supabase_user_data_fetcher(client, table="user_data"):
+    """``fetch(user_id)`` returning the user's row from Supabase, or None."""
+    def fetch(user_id):
+        response = client.table(table).select(*USER_DATA_COLUMNS).eq("id", user_id).execute()
+        return response.data[0] if response.data else None
+
+    return fetch
+
+
+class UserDataCache:
+    """``fetch(user_id)`` results, kept for ``ttl`` seconds per user.
+
+    A row fetched while the user was invalidated may be older than the change
+    that caused it, so it is returned but not cached.
+    """
+
+    def __init__(self, fetch, ttl=30, max_entries=10000):
+        self.fetch = fetch
+        self.queries = 0
+        self._rows = LRUCache(max_entries, sizeof=lambda row: 1, ttl=ttl)
+        self._generation = 0
+        self._invalidated = LRUCache(max_entries, sizeof=lambda generation: 1)  # user -> generation
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return ``(row, cached)``; ``cached`` tells whether the query was avoided."""
+        row = self._rows.get(user_id)
+        if row is not None:
+            return row or None, True
+        with self._lock:
+            self.queries += 1
+            started = self._generation
+        row = self.fetch(user_id)
+        with self._lock:
+            if self._invalidated.get(user_id, 0) <= started:
+                self._rows.put(user_id, dict(row) if row else {})  # Users without a row are cached too
+        return row, False
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generation += 1
+            self._invalidated.put(user_id, self._generation)
+            self._rows.pop(user_id)
+
+    def stats(self):
+        return {"queries": self.queries, "avoided": self._rows.hits, "users": len(self._rows)}
+
+
+def make_supabase_counter_sender(client, function="increment_usage"):
+    """``send(user_id, counter, amount)`` adding ``amount`` to the counter with one RPC."""
+    def send(user_id, counter, amount):
+        client.rpc(function, {"user_uuid": user_id, "counter": counter, "amount": amount}).execute()
+
+    return send
+
+
+class UsageMeter:
+    """Write-behind buffer for usage counter increments.
+
+    ``record`` only adds to an in-memory count and appends a line to the
+    JSONL ``journal``; a background thread sends the increments with
+    ``send(user_id, counter, amount)``, one call per counter of a user, once
+    ``max_pending`` are waiting or every ``flush_interval`` seconds. Increments left in the journal by a process
+    that stopped before sending them are sent by the next one. Delivery is at
+    least once: a crash between a send and the journal rewrite repeats it.
+
+    ``on_flush(user_id)`` is called after the increments of a user were sent
+    and before they stop counting as pending, e.g. to invalidate a cached copy
+    of the counters.
+
+    Each process locks a journal of its own: when ``journal`` is taken by
+    another process, ``<journal>-1``, ``<journal>-2``, ... are tried, so a
+    restarted process picks up what is left in a free one.
+    """
+
+    def __init__(self, send, journal=None, max_pending=20, flush_interval=5.0, on_flush=None):
+        self.send = send
+        self.journal = journal
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.recorded = 0
+        self.sent = 0
+        self.failed = 0
+        self.flushes = 0
+        self._pending = Counter()  # (user_id, counter) -> increments not sent yet
+        self._in_flight = Counter()  # taken by the running flush
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._journal_lock = None
+        if journal:
+            directory = os.path.dirname(journal)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.journal = self._claim_journal(journal)
+            self._pending.update(self._read_journal())
+        self._thread = threading.Thread(target=self._loop, name="usage-meter", daemon=True)
+        self._thread.start()
+
+    def _claim_journal(self, journal):
+        # Two processes appending to and rewriting the same file would lose or repeat increments
+        if fcntl is None:
+            return journal
+        root, ext = os.path.splitext(journal)
+        for slot in itertools.count():
+            path = journal if slot == 0 else f"{root}-{slot}{ext}"
+            lock = open(f"{path}.lock", "a")
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                continue
+            self._journal_lock = lock  # Held until close(), or until the process ends
+            return path
+
+    def _read_journal(self):
+        counts = Counter()
+        try:
+            with open(self.journal, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        counts[entry["user"], entry["counter"]] += int(entry["n"])
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning("Skipping a broken usage journal line: %.80s", line)
+        except FileNotFoundError:
+            pass
+        return counts
+
+    def _append_journal(self, user_id, counter, amount):
+        with open(self.journal, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"user": user_id, "counter": counter, "n": amount}) + "\n")
+
+    def _rewrite_journal(self):
+        # Called with the lock held: everything that is not confirmed as sent stays in the journal
+        temp = f"{self.journal}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            for (user_id, counter), amount in (self._pending + self._in_flight).items():
+                f.write(json.dumps({"user": user_id, "counter": counter, "n": amount}) + "\n")
+        os.replace(temp, self.journal)
+
+    def record(self, user_id, counter, amount=1):
+        with self._lock:
+            self._pending[user_id, counter] += amount
+            self.recorded += amount
+            if self.journal:
+                self._append_journal(user_id, counter, amount)
+            full = sum(self._pending.values()) >= self.max_pending
+        if full:
+            self._wakeup.set()
+
+    def pending(self, user_id):
+        """Increments of ``user_id`` that are not in the database yet, as ``{counter: n}``."""
+        with self._lock:
+            counts = self._pending + self._in_flight
+        return {counter: amount for (user, counter), amount in counts.items() if user == user_id}
+
+    def flush(self):
+        """Send everything recorded so far; increments that fail stay pending for the next flush."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                self._in_flight, self._pending = self._pending, Counter()
+            for (user_id, counter), amount in list(self._in_flight.items()):
+                try:
+                    self.send(user_id, counter, amount)
+                except Exception:
+                    logger.exception("Could not send %d usage increments %s of %s", amount, counter, user_id)
+                    self.failed += 1
+                    continue
+                self.sent += amount
+                # Invalidated once the write is committed but before the increments stop counting as
+                # pending, so a reader never sees a cached row without them and no pending increments either
+                if self.on_flush is not None:
+                    self.on_flush(user_id)
+                with self._lock:
+                    del self._in_flight[user_id, counter]
+            with self._lock:
+                self._pending.update(+self._in_flight)  # What failed goes back in the queue
+                self._in_flight = Counter()
+                self.flushes += 1
+                if self.journal:
+                    self._rewrite_journal()
+
+    def _loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Usage flush failed")
+
+    def close(self):
+        """Stop the background thread and send what is left."""
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+        if self._journal_lock is not None:
+            self._journal_lock.close()
+            self._journal_lock = None
+
+    def stats(self):
+        with self._lock:
+            pending = sum((self._pending + self._in_flight).values())
+        return {"recorded": self.recorded, "sent": self.sent, "failed": self.failed,
+                "pending": pending, "flushes": self.flushes}
@@ -0,0 +1,60 @@
+import base64
+import json
+import time
+
+from smartexam.auth import SessionCache
+
+
+def make_token(claims):
+    def part(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+    return f"{part({'alg': 'HS256'})}.{part(claims)}.signature"
+
+
+def make_session(user_id="user-1", expires_in=3600, sub=None):
+    token = make_token({"sub": sub or user_id, "exp": int(time.time() + expires_in)})
+    return {"access_token": token, "user": {"id": user_id}}
+
+
+class Verifier:
+    def __init__(self, result="user-1", error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, token):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_fresh_token_is_checked_locally():
+    verify = Verifier()
+    cache = SessionCache(verify)
+    session = make_session()
+    assert cache.check(session) is session
+    assert cache.check(session) is session
+    assert verify.calls == 0
+
+
+def test_expired_or_foreign_token_is_rejected():
+    cache = SessionCache(Verifier())
+    assert cache.check(make_session(expires_in=-10)) is None
+    assert cache.check(make_session(sub="someone-else")) is None
+    assert cache.check({"access_token": "not-a-jwt", "user": {"id": "user-1"}}) is None
+
+
+def test_token_near_expiry_is_verified_once():
+    verify = Verifier()
+    cache = SessionCache(verify, leeway=60)
+    session = make_session(expires_in=30)
+    assert cache.check(session) is session
+    assert cache.check(session) is session
+    assert verify.calls == 1
+
+
+def test_failed_verification_rejects_the_session():
+    cache = SessionCache(Verifier(error=ConnectionError("offline")), leeway=60)
+    assert cache.check(make_session(expires_in=30)) is None
+    assert SessionCache(Verifier(result=None), leeway=60).check(make_session(expires_in=30)) is None
@@ -0,0 +1,44 @@
+from benchmarks.corpus import lecture_pages
+from smartexam.budget import QuestionBudget
+from smartexam.chunking import TokenChunker
+
+
+def allocate(pages, total, max_tokens, overlap_tokens):
+    budget = QuestionBudget(total, len(pages))
+    chunker = TokenChunker(max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+    texts = budget.track_texts(budget.track_pages(pages))
+    return [budget.allocate(chunk, overlap) for chunk, overlap in chunker.iter_chunks_with_overlap(texts)]
+
+
+def test_overlap_does_not_starve_last_chunks():
+    counts = allocate(lecture_pages(10, 0), 30, 400, 150)
+    assert sum(counts) == 30
+    assert len(counts) <= 30 and min(counts) >= 1
+
+
+def test_without_overlap():
+    counts = allocate(lecture_pages(10, 0), 30, 400, 0)
+    assert sum(counts) == 30 and min(counts) >= 1
+
+
+def test_more_chunks_than_questions():
+    counts = allocate(lecture_pages(5, 0), 3, 200, 80)
+    assert sum(counts) == 3
+    assert set(counts) <= {0, 1}
+
+
+def test_shares_follow_new_content():
+    budget = QuestionBudget(10, 2)
+    pages = ["a" * 999, "b" * 999]
+    list(budget.track_texts(budget.track_pages(pages)))
+    # The second chunk repeats half of the first one, so only its tail counts
+    assert budget.allocate("a" * 999) == 5
+    assert budget.allocate("a" * 500 + "b" * 999, overlap_chars=500) == 5
+    assert budget.allocate("") == 0
+
+
+def test_floor_of_one_per_chunk():
+    budget = QuestionBudget(10, 1)
+    list(budget.track_texts(budget.track_pages(["x" * 3000])))
+    counts = [budget.allocate("x" * 1490), budget.allocate("x" * 10), budget.allocate("x" * 1490)]
+    assert counts == [5, 1, 4]
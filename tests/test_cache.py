@@ -0,0 +1,62 @@
+import os
+import time
+
+from smartexam.cache import DiskCache, LRUCache, TieredCache
+
+
+def test_lru_evicts_least_recently_used_by_size():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"  # "b" is now the oldest
+    cache.put("c", b"1234")
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.current_bytes == 8
+    cache.put("huge", b"x" * 11)
+    assert "huge" not in cache and len(cache) == 2
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_lru_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = LRUCache(max_bytes=100, ttl=10)
+    cache.put("a", b"x")
+    now[0] += 11
+    assert cache.get("a", "gone") == "gone"
+    assert cache.current_bytes == 0
+
+
+def test_disk_cache_evicts_oldest_files(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10)
+    cache.put("a", b"12345")
+    os.utime(cache._path("a"), (1, 1))
+    cache.put("b", b"12345")
+    cache.put("c", b"12345")
+    assert cache.get("a") is None
+    assert cache.get("b") == b"12345" and cache.get("c") == b"12345"
+    cache.pop("b")
+    assert cache.get("b") is None
+
+
+def test_disk_cache_ttl(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl=60)
+    cache.put("a", b"data")
+    assert cache.get("a") == b"data"
+    os.utime(cache._path("a"), (time.time() - 120,) * 2)
+    assert cache.get("a") is None
+    assert not os.path.exists(cache._path("a"))
+
+
+def test_tiered_cache_promotes_disk_hits(tmp_path):
+    def make():
+        return TieredCache(100, dumps=str.encode, loads=bytes.decode, disk_dir=str(tmp_path))
+
+    make().put("k", "value")
+    cache = make()
+    assert cache.get("k") == "value"  # From disk
+    assert cache.get("k") == "value"  # From memory
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 2 / 3
@@ -0,0 +1,45 @@
+from smartexam.chunking import TokenChunker
+from smartexam.tokenizer import RegexTokenizer
+
+TOKENIZER = RegexTokenizer()
+
+
+def sentences(start, count, words=10):
+    return " ".join(" ".join(f"s{start + i}w{j}" for j in range(words)) + "." for i in range(count))
+
+
+def test_word_runs_fill_the_budget():
+    text = " ".join(f"word{i}" for i in range(1000))
+    chunker = TokenChunker(max_tokens=100, tokenizer=TOKENIZER)
+    chunks = chunker.chunk(text)
+    sizes = [TOKENIZER.count(chunk) for chunk in chunks]
+    assert 98 <= min(sizes[:-1]) and max(sizes[:-1]) <= 100
+    # The last words were too few for a chunk of their own
+    assert sizes[-1] <= 100 + chunker.min_tokens
+    assert " ".join(chunks) == text
+
+
+def test_overlap_repeats_end_of_previous_chunk():
+    pages = [sentences(10 * page, 4) for page in range(12)]
+    chunker = TokenChunker(max_tokens=100, tokenizer=TOKENIZER, overlap_tokens=30)
+    chunks = list(chunker.iter_chunks_with_overlap(pages))
+    assert len(chunks) > 1 and chunks[0][1] == 0
+    for (previous, _), (chunk, overlap_chars) in zip(chunks, chunks[1:]):
+        assert overlap_chars and previous.endswith(chunk[:overlap_chars])
+        assert TOKENIZER.count(chunk[overlap_chars:]) >= chunker.min_tokens
+
+
+def test_overlap_dropped_before_chunk_with_little_new_content():
+    pages = [sentences(0, 8), sentences(20, 3), sentences(40, 3) + " " + sentences(50, 1, words=5), sentences(60, 8)]
+    short = TokenChunker(max_tokens=100, tokenizer=TOKENIZER, overlap_tokens=40, min_tokens=0)
+    chunker = TokenChunker(max_tokens=100, tokenizer=TOKENIZER, overlap_tokens=40, min_tokens=40)
+    assert min(TOKENIZER.count(chunk[overlap:]) for chunk, overlap in short.iter_chunks_with_overlap(pages)) < 40
+    chunks = list(chunker.iter_chunks_with_overlap(pages))
+    assert min(TOKENIZER.count(chunk[overlap:]) for chunk, overlap in chunks) >= 40
+    assert max(TOKENIZER.count(chunk) for chunk, _ in chunks) <= 100
+
+
+def test_short_end_added_to_previous_chunk():
+    chunks = TokenChunker(max_tokens=100, tokenizer=TOKENIZER).chunk(sentences(0, 8) + "\n\nTail end.")
+    assert len(chunks) == 1
+    assert chunks[0].endswith("s7w9.\n\nTail end.")
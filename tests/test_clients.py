@@ -0,0 +1,16 @@
+from smartexam.clients import OpenAIClientPool, api_key_id
+
+
+def test_pool_keeps_recent_clients_and_closes_evicted():
+    pool = OpenAIClientPool(max_clients=2)
+    first = pool.get("sk-first")
+    assert pool.get("sk-first") is first
+    second = pool.get("sk-second")
+    pool.get("sk-first")  # "sk-second" is now the least recently used
+    pool.get("sk-third")
+    assert second.is_closed() and not first.is_closed()
+    assert pool.get("sk-first") is first
+    assert "sk-first" not in pool._clients and api_key_id("sk-first") in pool._clients
+    assert pool.stats()["clients"] == 2 and pool.stats()["evicted_clients"] == 1
+    pool.close()
+    assert first.is_closed()
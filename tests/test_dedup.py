@@ -0,0 +1,36 @@
+from smartexam.dedup import NearDuplicateFilter, jaccard, lsh_bands, shingles
+from smartexam.questions import Question
+
+
+def question(text, answer="Entropy"):
+    return Question(text, (answer, "Mass"), 0, "")
+
+
+def test_shingles_ignore_case_and_punctuation():
+    assert shingles("Hello,  World!") == shingles("hello world")
+    assert jaccard(shingles("abcdef"), shingles("abcdef")) == 1.0
+
+
+def test_lsh_bands_fit_the_permutations():
+    bands, rows = lsh_bands(0.6, 64)
+    assert bands * rows <= 64
+    assert abs((1 / bands) ** (1 / rows) - 0.6) < 0.1
+
+
+def test_near_duplicates_are_removed():
+    dedup = NearDuplicateFilter(threshold=0.6)
+    questions = [
+        question("What does the second law of thermodynamics say about entropy?"),
+        question("What does the second law of thermodynamics say about entropy ?"),
+        question("Which quantity is conserved in an elastic collision?", "Kinetic energy"),
+    ]
+    assert dedup.filter(questions) == [questions[0], questions[2]]
+    stats = dedup.stats()
+    assert (stats["seen"], stats["kept"], stats["removed"]) == (3, 2, 1)
+    assert dedup.removed[0][1] == "What does the second law of thermodynamics say about entropy? Entropy"
+
+
+def test_same_question_with_another_answer_is_kept():
+    dedup = NearDuplicateFilter(threshold=0.9)
+    assert dedup.add(question("Which law is this about?", "The first law of thermodynamics"))
+    assert dedup.add(question("Which law is this about?", "Newton's third law of motion"))
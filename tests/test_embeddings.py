@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from smartexam.embeddings import DenseIndex, DenseIndexStore, HashingEmbedder, OpenAIEmbedder
+from smartexam.retrieval import split_passages
+
+PAGES = [
+    "Photosynthesis turns light into chemical energy in the chloroplast.",
+    "The mitochondria is the powerhouse of the cell and makes ATP.",
+    "Enzymes lower the activation energy of reactions.",
+]
+
+
+def test_hashing_embedder_is_deterministic():
+    embedder = HashingEmbedder(dim=64)
+    first, second = embedder(["same text", "other words"]), embedder(["same text", "other words"])
+    assert first.shape == (2, 64) and first.dtype == np.float32
+    assert np.array_equal(first, second)
+
+
+def test_dense_index_finds_the_page():
+    index = DenseIndex.build(split_passages(PAGES), HashingEmbedder())
+    results = index.search("mitochondria powerhouse ATP", top_k=2)
+    assert results[0][1].page == 2
+    assert results[0][0] >= results[1][0]
+    assert np.allclose(np.linalg.norm(index.matrix, axis=1), 1.0)
+
+
+def test_store_builds_once_and_memory_maps(tmp_path):
+    calls = []
+
+    class CountingEmbedder(HashingEmbedder):
+        def __call__(self, texts):
+            calls.append(len(texts))
+            return super().__call__(texts)
+
+    embedder = CountingEmbedder()
+    store = DenseIndexStore(str(tmp_path), embedder)
+    assert store.load("doc") is None
+    built = store.load_or_build("doc", PAGES)
+    assert isinstance(built.matrix, np.memmap)
+    loaded = DenseIndexStore(str(tmp_path), embedder).load_or_build("doc", PAGES)
+    assert calls == [3]  # Only the first build embedded the passages
+    assert loaded.passages == built.passages
+    assert loaded.search("chloroplast light")[0][1].page == 1
+
+
+def test_empty_document():
+    index = DenseIndex.build([], HashingEmbedder())
+    assert index.search("anything") == []
+
+
+def test_openai_embedder_gets_its_client_on_every_call():
+    clients = []
+
+    def create(model, input):
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[1.0, 0.0]) for _ in input])
+
+    def get_client():
+        clients.append(SimpleNamespace(embeddings=SimpleNamespace(create=create)))
+        return clients[-1]
+
+    embedder = OpenAIEmbedder(get_client, batch_size=2)
+    assert embedder(["a", "b", "c"]).shape == (3, 2)
+    embedder(["d"])
+    assert len(clients) == 2
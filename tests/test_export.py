@@ -0,0 +1,46 @@
+import io
+import logging
+import zipfile
+
+import pytest
+
+from smartexam.export import ExamPdfExporter, iter_exam_zip
+from smartexam.questions import Question
+
+QUESTIONS = [Question("Что такое энтропия?", ("Мера беспорядка", "Масса"), 0, "Из термодинамики.")]
+
+
+@pytest.mark.parametrize("title", ["Лекция", "日本", "Generated Exam"])
+def test_build_with_any_title(title):
+    exporter = ExamPdfExporter()
+    data = exporter.build(QUESTIONS, title)
+    assert data.startswith(b"%PDF")
+    # The bundled font is used and embedded, so the questions are not forced into Latin-1
+    assert exporter.stats()["unicode"]
+    assert b"/FontFile2" in data and b"DejaVuSans" in data
+
+
+def test_build_without_unicode_font(caplog):
+    with caplog.at_level(logging.WARNING, logger="smartexam.export"):
+        exporter = ExamPdfExporter(font_path=None)
+    assert not exporter.stats()["unicode"]
+    assert "Latin-1" in caplog.text
+    data = exporter.build(QUESTIONS, "Лекция")
+    assert data.startswith(b"%PDF")
+    assert b"/FontFile2" not in data
+
+
+def test_zip_with_non_latin1_titles():
+    exams = [{"id": f"{i:032x}", "title": title, "questions": [q.to_dict() for q in QUESTIONS]}
+             for i, title in enumerate(["Лекция.pdf", "日本.pdf"])]
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(iter_exam_zip(exams, formats=("pdf",)))))
+    assert len(archive.namelist()) == 2
+    assert archive.testzip() is None
+
+
+def test_zip_names_keep_the_full_id():
+    # Ids that only differ after the first characters must not end up under the same name
+    exams = [{"id": f"abcdef12{i:024x}", "title": "Lecture.pdf", "questions": [q.to_dict() for q in QUESTIONS]}
+             for i in range(2)]
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(iter_exam_zip(exams, formats=("json",)))))
+    assert sorted(archive.namelist()) == [f"json/Lecture-{exam['id']}.json" for exam in exams]
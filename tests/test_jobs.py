@@ -0,0 +1,101 @@
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from smartexam.jobs import JobQueue
+
+
+def wait_for(queue, job_id, statuses=("done", "failed")):
+    for _ in range(500):
+        job = queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError(f"job {job_id} is still {job['status']}")
+
+
+def test_job_result_and_join(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    release = threading.Event()
+    live = object()
+
+    def run():
+        release.wait(5)
+        return {"questions": 3}
+
+    job_id = queue.submit("key", lambda: (live, run))
+    assert queue.submit("key", lambda: pytest.fail("a joined job is not created")) == job_id
+    assert queue.live(job_id) is live
+    release.set()
+    job = wait_for(queue, job_id)
+    assert (job["status"], job["result"]) == ("done", {"questions": 3})
+    assert queue.live(job_id) is None
+    assert queue.submit("key", lambda: (None, lambda: 1)) != job_id
+
+
+def test_failed_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+
+    def run():
+        raise ValueError("bad PDF")
+
+    job = wait_for(queue, queue.submit("key", lambda: (None, run)))
+    assert (job["status"], job["error"]) == ("failed", "bad PDF")
+    with pytest.raises(RuntimeError):
+        queue.submit("other", lambda: (_ for _ in ()).throw(RuntimeError("no client")))
+    assert queue.stats()["failed"] == 2
+
+
+def set_job(path, job_id, **columns):
+    with sqlite3.connect(path) as db:
+        for column, value in columns.items():
+            db.execute(f"UPDATE jobs SET {column} = ? WHERE id = ?", (value, job_id))
+    db.close()
+
+
+def test_jobs_of_another_process(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    release = threading.Event()
+    queue = JobQueue(path)
+    job_id = queue.submit("key", lambda: (None, lambda: release.wait(5)))
+    wait_for(queue, job_id, ("running",))
+
+    # A second process sharing the table leaves a job alone while its owner is alive
+    other = JobQueue(path)
+    assert other.get(job_id)["status"] == "running" and other.live(job_id) is None
+    assert other.submit("key", lambda: pytest.fail("the running job is joined")) == job_id
+
+    # ... and fails it once the owner stopped touching it
+    set_job(path, job_id, updated=time.time() - 120)
+    job = other.get(job_id)
+    release.set()
+    assert (job["status"], job["error"]) == ("failed", "interrupted")
+    assert other.get("unknown") is None
+
+
+def test_jobs_of_an_exited_process_are_failed(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    queue = JobQueue(path)
+    exited = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    release = threading.Event()
+    job_id = queue.submit("key", lambda: (None, lambda: release.wait(5)))
+    wait_for(queue, job_id, ("running",))
+    set_job(path, job_id, owner=f"{socket.gethostname()}:{exited.stdout.strip()}:0")
+    job = JobQueue(path).get(job_id)
+    release.set()
+    assert (job["status"], job["error"]) == ("failed", "interrupted")
+
+
+def test_failed_job_is_not_joined(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    release = threading.Event()
+    job_id = queue.submit("key", lambda: (None, lambda: release.wait(5)))
+    queue.fail(job_id, "timed out")
+    assert queue.get(job_id)["error"] == "timed out"
+    assert queue.submit("key", lambda: (None, lambda: 1)) != job_id
+    release.set()
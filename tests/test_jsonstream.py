@@ -0,0 +1,32 @@
+import json
+
+from smartexam.jsonstream import JsonArrayParser, iter_json_array
+
+ITEMS = [{"q": "Why [brackets]?", "c": ["a \"quoted\" }", "b"], "a": 0}, {"q": "Second", "c": [], "a": 1}]
+
+
+def test_elements_come_out_as_soon_as_they_are_complete():
+    text = "```json\n" + json.dumps(ITEMS) + "\n```"
+    parser = JsonArrayParser()
+    first_end = text.index("}, {") + 1
+    assert parser.feed(text[:first_end - 1]) == []
+    assert parser.feed(text[first_end - 1:first_end]) == [ITEMS[0]]
+    assert parser.feed(text[first_end:]) == [ITEMS[1]]
+    assert parser.finished
+
+
+def test_any_split_gives_the_same_elements():
+    text = json.dumps(ITEMS, ensure_ascii=False)
+    for size in (1, 3, 7):
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        assert list(iter_json_array(pieces)) == ITEMS
+
+
+def test_broken_element_is_skipped():
+    parser = JsonArrayParser()
+    assert parser.feed('[{"q": 1,}, {"q": 2}] trailing [{"q": 3}]') == [{"q": 2}]
+    assert parser.errors == 1
+
+
+def test_text_without_array():
+    assert list(iter_json_array(["no array", " here"])) == []
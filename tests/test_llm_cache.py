@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+
+from smartexam.llm_cache import ResponseCache, response_key
+
+MESSAGES = [{"role": "user", "content": "Summarize   this\nlecture"}]
+
+
+def test_key_ignores_whitespace_but_not_settings():
+    key = response_key("gpt-4o", MESSAGES, 0.3)
+    assert key == response_key("gpt-4o", [{"role": "user", "content": "Summarize this lecture"}], 0.3)
+    assert key != response_key("gpt-4o", MESSAGES, 0.7)
+    assert key != response_key("gpt-4o", MESSAGES, 0.3, response_format={"type": "json_object"})
+
+
+def test_hits_count_saved_tokens(tmp_path):
+    cache = ResponseCache(disk_dir=str(tmp_path))
+    key = response_key("gpt-4o", MESSAGES, 0.3)
+    assert cache.get(key) is None
+    cache.put(key, "A summary", SimpleNamespace(prompt_tokens=100, completion_tokens=20))
+    assert cache.get(key) == "A summary"
+    assert cache.stats()["tokens_saved"] == 120
+    # A new process finds the response on disk
+    assert ResponseCache(disk_dir=str(tmp_path)).get(key) == "A summary"
+
+
+def test_put_without_usage():
+    cache = ResponseCache()
+    cache.put("k", "text")
+    assert cache.get("k") == "text" and cache.stats()["tokens_saved"] == 0
@@ -0,0 +1,28 @@
+import os
+
+from benchmarks.corpus import lecture_pdf
+from smartexam.pdf_text import PdfExtractor, extract_pages
+
+
+def test_parallel_extraction_matches_serial():
+    data = lecture_pdf(6)
+    extractor = PdfExtractor(workers=2, min_parallel_pages=1)
+    try:
+        assert extractor.is_parallel(6)
+        assert extractor.extract_pages(data) == extract_pages(data)
+    finally:
+        extractor.shutdown()
+
+
+def test_broken_pool_falls_back_to_serial():
+    data = lecture_pdf(4)
+    extractor = PdfExtractor(workers=2, min_parallel_pages=1)
+    try:
+        broken = extractor._get_pool()
+        broken.submit(os._exit, 1).exception()  # Kills a worker, which breaks the pool
+        assert extractor.extract_pages(data) == extract_pages(data)
+        assert extractor._pool is None
+        assert extractor.extract_pages(data) == extract_pages(data)  # With a new pool
+        assert extractor._pool is not broken
+    finally:
+        extractor.shutdown()
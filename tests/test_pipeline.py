@@ -0,0 +1,102 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from smartexam import pipeline
+from smartexam.budget import QuestionBudget
+from smartexam.chunking import TokenChunker
+from smartexam.pipeline import OrderedFeed, call_with_retries, stream_exam_responses, stream_ordered
+from smartexam.tokenizer import RegexTokenizer
+
+
+def test_stream_ordered_keeps_unit_order():
+    release = threading.Event()
+
+    def work(unit):
+        if unit == 0:
+            release.wait(5)
+        return unit * 10
+
+    with ThreadPoolExecutor(4) as executor:
+        results = stream_ordered(range(4), work, executor)
+        release.set()
+        assert list(results) == [0, 10, 20, 30]
+
+
+def test_stream_ordered_limits_pending_units():
+    pulled = []
+
+    def units():
+        for unit in range(6):
+            pulled.append(unit)
+            yield unit
+
+    with ThreadPoolExecutor(2) as executor:
+        results = stream_ordered(units(), lambda unit: unit, executor, max_pending=2)
+        assert next(results) == 0
+        assert len(pulled) <= 3
+        assert list(results) == [1, 2, 3, 4, 5]
+
+
+def test_call_with_retries(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(pipeline.time, "sleep", sleeps.append)
+    calls = []
+
+    def flaky(arg):
+        calls.append(arg)
+        if len(calls) < 3:
+            raise RuntimeError("try again")
+        return arg
+
+    assert call_with_retries(flaky, "x", retries=2, backoff=1.0) == "x"
+    assert sleeps == [1.0, 2.0]
+    calls.clear()
+    with pytest.raises(RuntimeError):
+        call_with_retries(flaky, "x", retries=1, backoff=0)
+    assert len(calls) == 2
+
+
+def test_stream_exam_responses_retries_and_gives_up(monkeypatch):
+    monkeypatch.setattr(pipeline.time, "sleep", lambda seconds: None)
+    attempts = {}
+
+    def generate(index, chunk, use_cache=True):
+        attempts.setdefault(index, []).append(use_cache)
+        if index == 1:
+            raise RuntimeError("model down")
+        return index
+
+    pages = ["First page. " * 30, "Second page. " * 30, "Third page. " * 30]
+    chunker = TokenChunker(max_tokens=70, tokenizer=RegexTokenizer())
+    results = list(stream_exam_responses(pages, generate, chunker=chunker, retries=1, indexed=True,
+                                         retry_kwargs={"use_cache": False}))
+    assert len(results) == len(list(chunker.iter_chunks(pages))) > 2
+    assert results[1] is None
+    assert results[:1] + results[2:] == [0] + list(range(2, len(results)))
+    assert attempts[1] == [True, False]
+
+
+def test_ordered_feed_publishes_in_unit_order():
+    feed = OrderedFeed(accept=lambda item: item != "drop")
+    feed.add(1, "b1")
+    feed.add(0, "a1")
+    assert feed.items == ["a1"]
+    feed.add(0, "drop")
+    feed.finish(0)
+    assert feed.items == ["a1", "b1"]
+    feed.add(1, "b2")
+    assert feed.items == ["a1", "b1", "b2"] and feed.count(1) == 2
+    feed.add(3, "d1")
+    assert feed.wait(3, timeout=0) == 3
+    feed.close()
+    assert feed.items[-1] == "d1" and feed.closed
+
+
+def test_budget_shares_reach_generate():
+    pages = ["Lecture text about cells. " * 40 for _ in range(4)]
+    budget = QuestionBudget(12, len(pages))
+    chunker = TokenChunker(max_tokens=120, tokenizer=RegexTokenizer())
+    shares = list(stream_exam_responses(pages, lambda chunk, questions: questions, chunker=chunker, budget=budget))
+    assert sum(shares) == 12 and min(shares) >= 1
@@ -0,0 +1,33 @@
+from smartexam.retrieval import BM25Index, Passage, format_passages, split_passages, tokenize
+
+PAGES = [
+    "Photosynthesis turns light into chemical energy in the chloroplast.",
+    "The mitochondria is the powerhouse of the cell and makes ATP.",
+    "Enzymes lower the activation energy of reactions.",
+]
+
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("What is the Powerhouse of a cell?") == ["powerhouse", "cell"]
+
+
+def test_split_passages_overlap_and_pages():
+    words = " ".join(f"w{i}" for i in range(25))
+    passages = split_passages([words, "short page"], max_words=10, overlap_words=2)
+    assert [passage.page for passage in passages] == [1, 1, 1, 2]
+    assert passages[0].text.split()[-2:] == passages[1].text.split()[:2]
+    assert passages[-1] == Passage(2, "short page")
+
+
+def test_bm25_ranks_matching_page_first():
+    index = BM25Index.from_pages(PAGES)
+    results = index.search("which organelle makes ATP for the cell", top_k=2)
+    assert results[0][1].page == 2
+    assert len(results) == 1  # No other passage shares a term
+    assert index.search("quantum chromodynamics") == []
+
+
+def test_format_passages_in_page_order():
+    index = BM25Index.from_pages(PAGES)
+    text = format_passages(index.search("energy", top_k=3))
+    assert text.startswith("[Page 1]") and "[Page 3]" in text
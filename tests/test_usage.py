@@ -0,0 +1,93 @@
+import json
+import threading
+
+from smartexam.usage import UsageMeter, UserDataCache
+
+
+class Sender:
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+
+    def __call__(self, user_id, counter, amount):
+        if self.fail:
+            raise ConnectionError("offline")
+        self.sent.append((user_id, counter, amount))
+
+
+def test_increments_of_a_counter_are_sent_in_one_call():
+    send = Sender()
+    flushed = []
+    meter = UsageMeter(send, max_pending=100, flush_interval=60, on_flush=flushed.append)
+    meter.record("u1", "pdf_upload_count")
+    meter.record("u1", "pdf_upload_count")
+    meter.record("u2", "img_upload_count")
+    assert meter.pending("u1") == {"pdf_upload_count": 2}
+    assert send.sent == []
+    meter.flush()
+    assert sorted(send.sent) == [("u1", "pdf_upload_count", 2), ("u2", "img_upload_count", 1)]
+    assert meter.pending("u1") == {} and set(flushed) == {"u1", "u2"}
+    meter.close()
+    assert meter.stats()["sent"] == 3
+
+
+def test_failed_increments_stay_in_the_journal(tmp_path):
+    journal = str(tmp_path / "usage.jsonl")
+    meter = UsageMeter(Sender(fail=True), journal=journal, flush_interval=60)
+    meter.record("u1", "mc_upload_count", 3)
+    meter.close()
+    assert meter.stats()["failed"] >= 1 and meter.pending("u1") == {"mc_upload_count": 3}
+    with open(journal) as f:
+        assert [json.loads(line)["n"] for line in f] == [3]
+
+    # The next process sends what is left
+    send = Sender()
+    meter = UsageMeter(send, journal=journal, flush_interval=60)
+    meter.close()
+    assert send.sent == [("u1", "mc_upload_count", 3)]
+
+
+def test_full_buffer_wakes_the_sender():
+    sent = threading.Event()
+    meter = UsageMeter(lambda user_id, counter, amount: sent.set(), max_pending=2, flush_interval=60)
+    meter.record("u1", "pdf_upload_count")
+    meter.record("u1", "pdf_upload_count")
+    assert sent.wait(5)
+    meter.close()
+
+
+def test_user_data_cache():
+    rows = {"u1": {"subscription_tier": "free"}}
+    fetches = []
+
+    def fetch(user_id):
+        fetches.append(user_id)
+        return rows.get(user_id)
+
+    cache = UserDataCache(fetch, ttl=60)
+    assert cache.get("u1") == ({"subscription_tier": "free"}, False)
+    assert cache.get("u1") == ({"subscription_tier": "free"}, True)
+    assert cache.get("nobody") == (None, False)
+    assert cache.get("nobody") == (None, True)
+    cache.invalidate("u1")
+    rows["u1"] = {"subscription_tier": "pro"}
+    assert cache.get("u1") == ({"subscription_tier": "pro"}, False)
+    assert fetches == ["u1", "nobody", "u1"]
+
+
+def test_row_fetched_during_invalidation_is_not_cached():
+    rows = {"u1": {"pdf_upload_count": 1}}
+    cache = None
+
+    def fetch(user_id):
+        row = dict(rows[user_id])
+        # The counter is written and invalidated while this (now stale) row is on its way back
+        rows[user_id] = {"pdf_upload_count": 2}
+        cache.invalidate(user_id)
+        return row
+
+    cache = UserDataCache(fetch, ttl=60)
+    assert cache.get("u1") == ({"pdf_upload_count": 1}, False)
+    cache.fetch = lambda user_id: dict(rows[user_id])
+    assert cache.get("u1") == ({"pdf_upload_count": 2}, False)
+    assert cache.get("u1") == ({"pdf_upload_count": 2}, True)